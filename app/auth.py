@@ -1,55 +1,184 @@
-from datetime import datetime, timedelta, UTC
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional
+import bcrypt
+from argon2.exceptions import InvalidHashError, VerificationError
+from argon2.low_level import Type, verify_secret
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+import jwt
+import orjson
+from jwt import InvalidTokenError as JWTError
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app import models, schemas, crud
 from app.database import SessionLocal
 from app.dependencies import get_db
 from app.config import settings
+from app.services.redis_cache import user_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+@lru_cache()
+def get_pwd_context():
+    """Build the passlib context on first use; importing passlib and probing backends is slow"""
+    from passlib.context import CryptContext
+    from passlib.hash import bcrypt as bcrypt_handler
+
+    # Legacy bcrypt hashes must be checked by the native C backend, never the pure-Python fallback
+    bcrypt_handler.set_backend("bcrypt")
+
+    # New hashes use argon2id, by default at the OWASP minimum (19 MiB, t=2, p=1); legacy bcrypt
+    # hashes and argon2 hashes with other parameters are rehashed on the next successful login
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        default="argon2",
+        deprecated="auto",
+        argon2__time_cost=settings.argon2_time_cost,
+        argon2__memory_cost=settings.argon2_memory_cost,
+        argon2__parallelism=1,
+        bcrypt__ident="2b",
+        bcrypt__rounds=settings.bcrypt_rounds,
+    )
+
+@lru_cache()
+def get_dummy_hash() -> str:
+    """Hash verified against for unknown emails so a miss costs the same as a wrong password"""
+    return get_pwd_context().hash("!")
+
+# Short-lived cache of already verified access tokens: token digest -> (payload, user_id, expires_at)
+TOKEN_CACHE_MAX_SIZE = 10_000
+TOKEN_CACHE_TTL_SECONDS = min(60, settings.access_token_expire_minutes * 60)
+
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+# The HMAC key, algorithm list and signer objects are prepared once instead of on every token
+_SECRET_BYTES = settings.secret_key.encode()
+_ALGORITHMS = [settings.algorithm]
+_JWS = jwt.PyJWS()
+_JWT = jwt.PyJWT(options={"require": ["exp", "sub", "type"]})
+
+def _encode_token(payload) -> str:
+    # orjson serializes the claims; PyJWS only adds the header, HMAC and base64
+    return _JWS.encode(orjson.dumps(payload), _SECRET_BYTES, algorithm=settings.algorithm)
+
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def _argon2_verify(password: bytes, hashed: bytes) -> bool:
+    try:
+        return verify_secret(hashed, password, Type.ID)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def _bcrypt_verify(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        return False
+
+# Hash prefix -> verifier, so the hot path skips passlib's scheme detection
+_VERIFIERS = {
+    "$argon2id$": _argon2_verify,
+    "$2b$": _bcrypt_verify,
+}
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    verifier = _VERIFIERS.get(hashed_password[:hashed_password.find("$", 1) + 1])
+    if verifier is None:
+        return get_pwd_context().verify(plain_password, hashed_password)
+    return verifier(plain_password.encode(), hashed_password.encode())
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.now(UTC) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else settings.access_token_expire_minutes * 60
+    to_encode.update({"exp": int(time.time()) + lifetime, "type": "access"})
+    return _encode_token(to_encode)
 
 def get_user_by_email(db, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+    cached = user_cache.get_user(email)
+    if cached is not None:
+        # Attach the cached row to this session without a SELECT; changes still flush normally
+        user = models.User(**cached)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is not None:
+        user_cache.set_user(user)
+    return user
+
+def email_registered(db, email: str) -> bool:
+    # Existence probe only: no columns fetched, no ORM object built
+    stmt = select(literal(1)).where(models.User.email == email).limit(1)
+    return db.execute(stmt).first() is not None
 
 def authenticate_user(db, email: str, password: str):
     user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
+        verify_password(password, get_dummy_hash())
         return False
+    if not verify_password(password, user.hashed_password):
+        return False
+    if get_pwd_context().needs_update(user.hashed_password):
+        user.hashed_password = get_password_hash(password)
+        db.commit()
+        user_cache.delete_user(user.email)
     return user
 
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def _get_cached_user(db: Session, key: bytes):
+    """Return the user for an already verified token, or None on a miss"""
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is None:
+        return None
+
+    payload, user_id, expires_at = cached
+    if time.time() < expires_at:
+        # Re-attach through the primary key so ORM objects never cross sessions, and a deleted
+        # or renamed user stops authenticating at once
+        user = db.get(models.User, user_id)
+        if user is not None and user.email == payload["sub"]:
+            return user
+
+    with _token_cache_lock:
+        _token_cache.pop(key, None)
+    return None
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = _token_cache_key(token)
+    user = _get_cached_user(db, key)
+    if user is not None:
+        return user
+
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError as e:
+        payload = _JWT.decode(token, _SECRET_BYTES, algorithms=_ALGORITHMS)
+    except JWTError:
+        raise credentials_exception
+    if payload.get("type") != "access":
         raise credentials_exception
+
+    email: str = payload["sub"]
     user = get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    # Never serve a token from the cache past its own expiry
+    expires_at = min(time.time() + TOKEN_CACHE_TTL_SECONDS, payload["exp"])
+    with _token_cache_lock:
+        _token_cache[key] = (payload, user.id, expires_at)
+    return user
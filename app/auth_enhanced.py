@@ -1,28 +1,36 @@
 """
 Enhanced authentication with security best practices
 """
-from datetime import datetime, timedelta, UTC
+from datetime import timedelta
 from typing import Optional, Dict, Any
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jwt import InvalidTokenError as JWTError
 from sqlalchemy.orm import Session
+import re
 import secrets
 import time
-from collections import defaultdict
 
 from app import models
+from app.auth import _ALGORITHMS, _JWT, _SECRET_BYTES, _encode_token, get_pwd_context
 from app.config import settings
 from app.dependencies import get_db
+from app.logging_config import get_logger
+from app.redis_config import get_sync_redis_client
 
-# Rate limiting storage (in production, use Redis)
-login_attempts = defaultdict(list)
+logger = get_logger("auth_enhanced")
+
+# Rate limiting storage, shared by all workers: one sorted set of attempt timestamps per identifier
+rate_limit_redis = get_sync_redis_client()
+RATE_LIMIT_PREFIX = "rl:"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
+# At least 8 characters with an uppercase letter, a lowercase letter and a digit
+PASSWORD_STRENGTH_RE = re.compile(r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d).{8,}$", re.DOTALL)
+
+
 class AuthenticationError(Exception):
     pass
 
@@ -33,57 +41,52 @@ class RateLimitError(Exception):
 
 def validate_password_strength(password: str) -> bool:
     """Validate password meets security requirements"""
-    if len(password) < 8:
-        return False
-    if not any(c.isupper() for c in password):
-        return False
-    if not any(c.islower() for c in password):
-        return False
-    if not any(c.isdigit() for c in password):
-        return False
-    return True
+    return PASSWORD_STRENGTH_RE.match(password) is not None
 
 
 def check_rate_limit(identifier: str, max_attempts: int = 5, window_minutes: int = 15) -> bool:
     """Check if rate limit is exceeded"""
-    now = time.time()
-    window_start = now - (window_minutes * 60)
+    now_ns = time.time_ns()
+    now = now_ns / 1e9
+    window_seconds = window_minutes * 60
+    window_start = now - window_seconds
+    key = f"{RATE_LIMIT_PREFIX}{identifier}"
     
-    # Clean old attempts
-    login_attempts[identifier] = [
-        attempt_time for attempt_time in login_attempts[identifier]
-        if attempt_time > window_start
-    ]
-    
-    if len(login_attempts[identifier]) >= max_attempts:
-        return False
+    try:
+        pipe = rate_limit_redis.pipeline()
+        pipe.zremrangebyscore(key, 0, window_start)
+        pipe.zadd(key, {str(now_ns): now})
+        pipe.zcard(key)
+        pipe.expire(key, window_seconds)
+        _, _, count, _ = pipe.execute()
+    except Exception as e:
+        # Fail open: an unavailable Redis must not lock every user out
+        logger.error(f"Rate limit check failed for {identifier}: {e}")
+        return True
     
-    login_attempts[identifier].append(now)
-    return True
+    return count <= max_attempts
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.now(UTC) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else settings.access_token_expire_minutes * 60
+    to_encode.update({"exp": int(time.time()) + lifetime, "type": "access"})
+    return _encode_token(to_encode)
 
 
 def create_refresh_token(data: Dict[str, Any]) -> str:
     to_encode = data.copy()
-    expire = datetime.now(UTC) + timedelta(days=settings.refresh_token_expire_days)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+    lifetime = settings.refresh_token_expire_days * 86400
+    to_encode.update({"exp": int(time.time()) + lifetime, "type": "refresh"})
+    return _encode_token(to_encode)
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
@@ -111,11 +114,11 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        token_type: str = payload.get("type")
+        payload = _JWT.decode(token, _SECRET_BYTES, algorithms=_ALGORITHMS)
+        email: str = payload["sub"]
+        token_type: str = payload["type"]
         
-        if email is None or token_type != "access":
+        if token_type != "access":
             raise credentials_exception
             
     except JWTError:
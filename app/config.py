@@ -20,11 +20,14 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    bcrypt_rounds: int = 10
+    argon2_time_cost: int = 2
+    argon2_memory_cost: int = 19456  # KiB
     
     # Database
     database_url: str
-    db_pool_size: int = 10
-    db_max_overflow: int = 20
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
     
     # Redis
     redis_host: str = "redis"
@@ -32,6 +35,9 @@ class Settings(BaseSettings):
     redis_password: Optional[str] = None
     redis_db: int = 0
     redis_url: Optional[str] = None
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0  # seconds to wait for a free pooled connection
+    click_flush_interval_seconds: float = 5.0
     
     # Rate Limiting
     rate_limit_per_minute: int = 60
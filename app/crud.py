@@ -1,49 +1,120 @@
 import secrets
+from typing import Optional
+from sqlalchemy import Connection, Integer, String, bindparam, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from app import models, schemas
 
 SHORT_KEY_NUM_BYTES = 6
 NUM_KEY_GENERATION_ATTEMPTS = 5
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+# Keys from the Redis sequence start at 62**5, six base62 digits (seven past 62**6); random keys
+# from token_urlsafe(SHORT_KEY_NUM_BYTES) are always eight characters
+SEQUENCE_KEY_LENGTHS = (6, 7)
 
-def create_link(db: Session, link_in: schemas.LinkCreate, user_id: int) -> models.Link:
-    for _ in range(NUM_KEY_GENERATION_ATTEMPTS):
-        short_key = secrets.token_urlsafe(SHORT_KEY_NUM_BYTES)
-        exists = db.query(models.Link).filter_by(short_key=short_key).first()
-        if not exists:
+# Built once for the redirect hot path: bump the counter and read the target in one round trip
+INCREMENT_CLICKS_STMT = (
+    update(models.Link)
+    .where(models.Link.short_key == bindparam("key"))
+    .values(clicks=models.Link.clicks + 1)
+    .returning(models.Link.target_url, models.Link.clicks)
+)
+
+def base62_encode(number: int) -> str:
+    digits = []
+    while True:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+        if number == 0:
+            return "".join(reversed(digits))
+
+def base62_decode(key: str) -> int:
+    number = 0
+    for char in key:
+        number = number * 62 + BASE62_ALPHABET.index(char)
+    return number
+
+def get_last_link_number(db) -> Optional[int]:
+    """Largest link number whose key from the Redis sequence is taken, or None if there is none"""
+    key_length = func.length(models.Link.short_key)
+    # Base62 digits are in ASCII order, so for keys of one length the byte-wise maximum is the largest number
+    stmt = (
+        select(models.Link.short_key)
+        .where(key_length.between(*SEQUENCE_KEY_LENGTHS), models.Link.short_key.regexp_match("^[0-9A-Za-z]+$"))
+        .order_by(key_length.desc(), models.Link.short_key.collate("C").desc())
+        .limit(1)
+    )
+    key = db.scalar(stmt)
+    return base62_decode(key) if key is not None else None
+
+def create_link(
+    db: Session, link_in: schemas.LinkCreate, user_id: int, short_key: Optional[str] = None
+) -> models.Link:
+    for attempt in range(NUM_KEY_GENERATION_ATTEMPTS):
+        # A preallocated key (from the Redis sequence) is tried first; random keys are the fallback
+        candidate = short_key if attempt == 0 and short_key else secrets.token_urlsafe(SHORT_KEY_NUM_BYTES)
+        # The unique index on short_key arbitrates collisions atomically; no row comes back on a clash
+        stmt = (
+            insert(models.Link)
+            .values(
+                short_key=candidate,
+                target_url=str(link_in.target_url),
+                owner_id=user_id
+            )
+            .on_conflict_do_nothing(index_elements=["short_key"])
+            .returning(models.Link)
+        )
+        db_link = db.scalars(stmt).first()
+        if db_link is not None:
             break
     else:
         raise Exception("Could not generate a unique short key.")
 
-    db_link = models.Link(
-        short_key=short_key,
-        target_url=str(link_in.target_url),
-        owner_id=user_id
-    )
-    db.add(db_link)
     db.commit()
-    db.refresh(db_link)
     return db_link
 
 def get_user_links(db: Session, user_id: int):
-    return db.query(models.Link).filter_by(owner_id=user_id).all()
+    return (
+        db.query(models.Link)
+        .filter_by(owner_id=user_id)
+        .order_by(models.Link.created_at.desc())
+        .all()
+    )
+
+def get_links_by_keys(db: Session, short_keys: list[str]) -> list[models.Link]:
+    """Resolve many short keys with one WHERE short_key IN (...) query"""
+    if not short_keys:
+        return []
+    return db.scalars(select(models.Link).where(models.Link.short_key.in_(short_keys))).all()
 
 def get_link_stats(db: Session, short_key: str):
-    link = db.query(models.Link).filter_by(short_key=short_key).first()
-    if not link:
-        return None
-    return link
+    """Return a (short_key, clicks) row, or None; stats need no other column and no ORM object"""
+    stmt = select(models.Link.short_key, models.Link.clicks).where(models.Link.short_key == short_key)
+    return db.execute(stmt).first()
 
 def get_link_and_increment_clicks(db: Session, short_key: str):
-    db_link = db.query(models.Link).filter_by(short_key=short_key).first()
-    if not db_link:
-        return None
-
-    # Increment clicks
-    db_link.clicks += 1
+    # One atomic UPDATE ... RETURNING instead of SELECT, flush and refresh
+    stmt = (
+        update(models.Link)
+        .where(models.Link.short_key == short_key)
+        .values(clicks=models.Link.clicks + 1)
+        .returning(models.Link)
+        .execution_options(populate_existing=True)
+    )
+    db_link = db.scalars(stmt).first()
     db.commit()
-    db.refresh(db_link)
     return db_link
 
+def increment_link_clicks(conn: Connection, short_key: str):
+    """Increment clicks on a Core connection, returning (target_url, clicks) or None"""
+    return conn.execute(INCREMENT_CLICKS_STMT, {"key": short_key}).first()
 
-
-
+def flush_link_clicks(conn: Connection, counts: dict[str, int]) -> None:
+    """Write buffered click counts for many links in a single UPDATE ... FROM (VALUES ...)"""
+    batch = values(column("k", String), column("c", Integer), name="v").data(list(counts.items()))
+    conn.execute(
+        update(models.Link)
+        .where(models.Link.short_key == batch.c.k)
+        # Never move a counter backwards if the DB was bumped by a cache miss meanwhile
+        .values(clicks=func.greatest(models.Link.clicks, batch.c.c))
+    )
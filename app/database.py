@@ -1,18 +1,37 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.config import settings
 
-# Create the database engine with proper configuration
+# PostgreSQL connections: UTC session timezone and TCP keepalives (instead of a pre-ping per checkout)
+connect_args = (
+    {
+        "options": "-c timezone=UTC",
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5,
+    }
+    if 'postgresql' in settings.database_url
+    else {}
+)
+
+# Create the database engine with proper configuration; this is the app's only connection pool
 engine = create_engine(
     settings.database_url,
+    poolclass=QueuePool,
     pool_size=settings.db_pool_size,
     max_overflow=settings.db_max_overflow,
-    echo=settings.debug  # Enable SQL logging in debug mode
+    pool_pre_ping=False,     # Avoid an extra SELECT 1 round trip on every checkout
+    pool_recycle=1800,       # Recycle connections after 30 minutes
+    connect_args=connect_args,
+    query_cache_size=1200,   # Compiled statement LRU cache, sized for every distinct query shape
+    echo=settings.debug      # Enable SQL logging in debug mode
 )
 
-# Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create a configured "Session" class; objects stay loaded after commit so responses need no reload
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for declarative class definitions
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
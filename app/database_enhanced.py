@@ -1,62 +1,20 @@
 """
 Enhanced database configuration with connection pooling and migrations support
 """
-import os
-from sqlalchemy import create_engine, event
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
-from dotenv import load_dotenv
 import logging
 
-from app.config import settings
+# The engine and Base are shared with app.database, so there is one connection pool
+from app.database import Base, engine
+from app.dependencies import get_db
 
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
-
-# Database configuration with connection pooling
-engine = create_engine(
-    settings.database_url,
-    poolclass=QueuePool,
-    pool_size=settings.db_pool_size,
-    max_overflow=settings.db_max_overflow,
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    echo=settings.debug  # Log SQL queries in debug mode
-)
-
-# Add connection event listeners for monitoring
-@event.listens_for(engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    """Configure database connection parameters"""
-    if 'postgresql' in settings.database_url:
-        # PostgreSQL specific configurations
-        with dbapi_connection.cursor() as cursor:
-            cursor.execute("SET timezone='UTC'")
-
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Logging (including the sqlalchemy.engine level, INFO only in debug) is configured by
+# app.logging_config.setup_logging(), not at import time
 
 
 class DatabaseManager:
     """Enhanced database session management"""
     
-    @staticmethod
-    def get_db():
-        """Dependency to get database session with proper error handling"""
-        db = SessionLocal()
-        try:
-            yield db
-        except Exception as e:
-            db.rollback()
-            raise e
-        finally:
-            db.close()
+    get_db = staticmethod(get_db)
     
     @staticmethod
     def create_tables():
@@ -82,6 +40,3 @@ class DatabaseManager:
 
 # Global database manager instance
 db_manager = DatabaseManager()
-
-# Backwards compatibility
-get_db = db_manager.get_db
@@ -5,7 +5,7 @@ import logging
 import traceback
 from typing import Dict, Any
 from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import time
@@ -56,7 +56,7 @@ async def custom_exception_handler(request: Request, exc: CustomException):
         }
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.message,
@@ -78,7 +78,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         }
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
@@ -99,7 +99,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "error": "Validation error",
@@ -124,7 +124,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "error": "Internal server error",
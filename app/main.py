@@ -1,10 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 from app.routers import links, auth
-from app.dependencies import get_db
 from app import crud, models
+from app.auth import get_pwd_context
 from app.services.redis_cache import link_cache
 from app.database import engine
 from app.config import settings
@@ -19,7 +20,8 @@ logger = get_logger("main")
 app = FastAPI(
     title=settings.app_name,
     debug=settings.debug,
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 @app.on_event("startup")
@@ -28,24 +30,88 @@ def on_startup():
     logger.info("Starting up Linkly API...")
     models.Base.metadata.create_all(bind=engine)
     logger.info("Database tables initialized")
+    pwd_context = get_pwd_context()
+    logger.info(
+        f"Password hashing: {pwd_context.default_scheme()} "
+        f"(legacy bcrypt backend: {pwd_context.handler('bcrypt').get_backend()}, rounds: {settings.bcrypt_rounds})"
+    )
     logger.info(f"Application started in {settings.environment} mode")
 
+CLICK_FLUSH_BATCH_SIZE = 1000
+
+def _flush_clicks_to_db(counts):
+    with engine.begin() as conn:
+        crud.flush_link_clicks(conn, counts)
+
+async def flush_dirty_clicks():
+    """Drain buffered Redis click counters into Postgres, one UPDATE per batch"""
+    while True:
+        counts = await link_cache.pop_dirty_clicks(CLICK_FLUSH_BATCH_SIZE)
+        if not counts:
+            return
+        try:
+            await run_in_threadpool(_flush_clicks_to_db, counts)
+        except Exception as e:
+            logger.error(f"Click flush failed for {len(counts)} links: {e}")
+            await link_cache.mark_clicks_dirty(counts)
+            return
+        if len(counts) < CLICK_FLUSH_BATCH_SIZE:
+            return
+
+async def _flush_clicks_periodically():
+    while True:
+        await asyncio.sleep(settings.click_flush_interval_seconds)
+        await flush_dirty_clicks()
+
+def _last_link_number():
+    with engine.connect() as conn:
+        return crud.get_last_link_number(conn)
+
+async def seed_link_numbers():
+    """Keep the Redis link number sequence ahead of every sequential key in the database"""
+    last_number = await run_in_threadpool(_last_link_number)
+    if last_number is not None:
+        await link_cache.seed_link_numbers(last_number)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Keep this worker's in-process link cache in sync and flush clicks out of band"""
+    # A flushed or failed-over Redis would otherwise hand out keys that are already taken
+    await seed_link_numbers()
+    app.state.background_tasks = [
+        asyncio.create_task(link_cache.listen_for_invalidations()),
+        asyncio.create_task(_flush_clicks_periodically()),
+    ]
+
 @app.on_event("shutdown")
-def on_shutdown():
+async def on_shutdown():
     """Cleanup on shutdown"""
     logger.info("Shutting down Linkly API...")
+    tasks = getattr(app.state, "background_tasks", [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await flush_dirty_clicks()
+    await link_cache.close()
 
 app.include_router(auth.router)
 app.include_router(links.router)
 
+def _redirect(target_url: str) -> Response:
+    # Stored targets are normalized, percent-encoded HttpUrls, so RedirectResponse's
+    # per-request URL quoting adds nothing; private keeps shared caches from eating clicks
+    return Response(status_code=307, headers={"location": target_url, "cache-control": "private, max-age=0"})
+
+def _increment_clicks_in_db(short_key: str):
+    with engine.begin() as conn:
+        return crud.increment_link_clicks(conn, short_key)
+
 @app.get("/{short_key}")
-def redirect_to_target_url(
-    short_key: str,
-    db: Session = Depends(get_db)
-):
+async def redirect_to_target_url(short_key: str):
     """
     Redirect to the target URL for a given short key.
-    Implements caching with Redis for performance.
+    Implements caching with Redis for performance; cache hits never leave the
+    event loop, and cache misses run a single UPDATE ... RETURNING in the threadpool.
     """
     try:
         # Validate short_key format
@@ -53,30 +119,26 @@ def redirect_to_target_url(
             raise HTTPException(status_code=400, detail="Invalid short key format")
         
         # Try Redis cache first
-        cached_link = link_cache.get_link(short_key)
+        cached_url = await link_cache.get_link(short_key)
         
-        if cached_link:
+        if cached_url:
             # Found in cache - increment clicks in Redis only
-            link_cache.increment_clicks(short_key)
-            return RedirectResponse(url=cached_link["target_url"], status_code=307)
+            await link_cache.increment_clicks(short_key)
+            return _redirect(cached_url)
         
         # Not in cache, get from database
-        db_link = crud.get_link_and_increment_clicks(db, short_key=short_key)
+        db_link = await run_in_threadpool(_increment_clicks_in_db, short_key)
         
         if db_link is None:
             raise HTTPException(status_code=404, detail="Link not found")
         
         # Cache for next time
-        link_cache.set_link(short_key, db_link.target_url)
+        await link_cache.set_link(short_key, db_link.target_url)
         
         # Initialize click counter in Redis with current DB value
-        current_clicks = link_cache.get_clicks(short_key)
-        if current_clicks == 0:
-            # Set initial click count from DB
-            for _ in range(db_link.clicks):
-                link_cache.increment_clicks(short_key)
+        await link_cache.seed_clicks(short_key, db_link.clicks)
         
-        return RedirectResponse(url=db_link.target_url, status_code=307)
+        return _redirect(db_link.target_url)
         
     except HTTPException:
         # Re-raise HTTP exceptions
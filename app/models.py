@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -23,6 +23,13 @@ class Link(Base):
     # Many-to-one relationship: a Link is owned by a User
     owner = relationship("User", back_populates="links")
 
+    __table_args__ = (
+        # Serves "links of a user, newest first" as an index range scan without a sort
+        Index("ix_links_owner_created", "owner_id", "created_at"),
+        # Serves the per-user duplicate-URL lookup in LinkService.create_link
+        Index("ix_links_owner_target", "owner_id", "target_url"),
+    )
+
 if __name__ == "__main__":
     from app.database import engine
     print("Creating all tables...")
@@ -32,4 +32,16 @@ def get_sync_redis_client() -> redis.Redis:
         settings.redis_url,
         encoding="utf-8",
         decode_responses=True
-    )
\ No newline at end of file
+    )
+
+# Asynchronous client for async handlers; bind it to the event loop that uses it
+def get_async_redis_client() -> aioredis.Redis:
+    # A blocking pool makes commands wait for a free connection instead of failing when it is full
+    pool = aioredis.BlockingConnectionPool.from_url(
+        settings.redis_url,
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout
+    )
+    return aioredis.Redis(connection_pool=pool)
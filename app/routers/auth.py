@@ -1,3 +1,7 @@
+import os
+from typing import Optional
+
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -10,10 +14,19 @@ router = APIRouter(
     tags=["auth"]
 )
 
+# Caps concurrent password verifications at 2x cores so a login flood queues instead of
+# occupying every worker thread; created lazily because it needs a running event loop
+_password_hash_limiter: Optional[anyio.CapacityLimiter] = None
+
+def get_password_hash_limiter() -> anyio.CapacityLimiter:
+    global _password_hash_limiter
+    if _password_hash_limiter is None:
+        _password_hash_limiter = anyio.CapacityLimiter((os.cpu_count() or 1) * 2)
+    return _password_hash_limiter
+
 @router.post("/signup", response_model=schemas.UserOut)
 def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    user = auth.get_user_by_email(db, user_in.email)
-    if user:
+    if auth.email_registered(db, user_in.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     hashed_password = auth.get_password_hash(user_in.password)
     db_user = models.User(email=user_in.email, hashed_password=hashed_password)
@@ -23,8 +36,14 @@ def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.post("/token", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await anyio.to_thread.run_sync(
+        auth.authenticate_user,
+        db,
+        form_data.username,
+        form_data.password,
+        limiter=get_password_hash_limiter(),
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from app import models, schemas, auth, crud
 from app.dependencies import get_db
 from app.services.redis_cache import link_cache
@@ -11,40 +12,62 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.LinkRead, status_code=status.HTTP_201_CREATED)
-def create_link(
+async def create_link(
     link: schemas.LinkCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     try:
-        db_link = crud.create_link(db=db, link_in=link, user_id=current_user.id)
+        # Sequential base62 keys from Redis never collide; crud falls back to random keys
+        link_number = await link_cache.next_link_number()
+        short_key = crud.base62_encode(link_number) if link_number is not None else None
+        db_link = await run_in_threadpool(
+            crud.create_link, db=db, link_in=link, user_id=current_user.id, short_key=short_key
+        )
+        if short_key is not None and db_link.short_key != short_key:
+            # The sequence handed out a taken key, so Redis lost it; move it past every key in the DB
+            last_number = await run_in_threadpool(crud.get_last_link_number, db)
+            if last_number is not None:
+                await link_cache.seed_link_numbers(last_number)
         
-        # Cache the new link immediately
-        link_cache.set_link(db_link.short_key, db_link.target_url)
+        # Cache the new link immediately; the owner's cached list is now out of date
+        await link_cache.set_link(db_link.short_key, db_link.target_url)
+        await link_cache.invalidate_user_links(current_user.id)
         
         return db_link
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/me", response_model=list[schemas.LinkRead])
-def my_links(
+async def my_links(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    return crud.get_user_links(db, current_user.id)
+    # The cached value is the finished JSON body; it goes out without parsing or re-validation
+    cached, generation = await link_cache.get_user_links(current_user.id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    db_links = await run_in_threadpool(crud.get_user_links, db, current_user.id)
+    body = schemas.LINK_LIST_ADAPTER.dump_json(schemas.LINK_LIST_ADAPTER.validate_python(db_links, from_attributes=True))
+    # Not cached if a link was created or deleted while the list was being read
+    await link_cache.set_user_links(current_user.id, body, generation)
+    return Response(content=body, media_type="application/json")
 
 @router.get("/{short_key}/stats", response_model=schemas.LinkStats)
-def link_stats(
+async def link_stats(
     short_key: str,
     db: Session = Depends(get_db),
 ):
-    link = crud.get_link_stats(db, short_key)
+    # Link and click count from Redis in one round trip; a live counter answers without the DB
+    cached_url, redis_clicks = await link_cache.get_link_and_clicks(short_key)
+    if cached_url is not None and redis_clicks > 0:
+        return schemas.LinkStats(short_key=short_key, clicks=redis_clicks)
+    
+    link = await run_in_threadpool(crud.get_link_stats, db, short_key)
     if not link:
         raise HTTPException(status_code=404, detail="Short link not found")
     
-    # Get click count from Redis
-    redis_clicks = link_cache.get_clicks(short_key)
-    
     # Use Redis count if available (it's more up-to-date), otherwise use DB
     total_clicks = redis_clicks if redis_clicks > 0 else link.clicks
     
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl, EmailStr, ConfigDict
+from pydantic import BaseModel, HttpUrl, EmailStr, ConfigDict, TypeAdapter
 from datetime import datetime
 
 class LinkCreate(BaseModel):
@@ -13,6 +13,9 @@ class LinkRead(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Validates and serializes a whole list of links in one pydantic-core call
+LINK_LIST_ADAPTER = TypeAdapter(list[LinkRead])
+
 class LinkStats(BaseModel):
     short_key: str
     clicks: int
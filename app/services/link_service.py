@@ -1,12 +1,14 @@
 """
 Service layer for URL shortening business logic
 """
+import asyncio
 import secrets
-import validators
 from typing import List, Optional
-from urllib.parse import urlparse
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from pydantic import HttpUrl
 
 from app import models, schemas
 from app.services.redis_cache import link_cache
@@ -16,9 +18,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 # Malicious domain blacklist (in production, use external service)
-BLOCKED_DOMAINS = {
+BLOCKED_DOMAINS = frozenset({
     'malware.com', 'phishing.net', 'spam.org'
-}
+})
 
 class URLValidationError(Exception):
     pass
@@ -30,70 +32,71 @@ class LinkService:
         self.short_key_length = 8
         self.max_generation_attempts = 10
     
-    def validate_url(self, url: str) -> str:
-        """Validate and normalize URL"""
-        if len(url) > settings.max_url_length:
+    def validate_url(self, url: HttpUrl) -> str:
+        """Apply business rules to a URL that pydantic already parsed and validated"""
+        url_str = str(url)
+        if len(url_str) > settings.max_url_length:
             raise URLValidationError("URL too long")
         
-        if not validators.url(url):
-            raise URLValidationError("Invalid URL format")
-        
-        parsed = urlparse(url)
-        if parsed.netloc.lower() in BLOCKED_DOMAINS:
+        if url.host.lower() in BLOCKED_DOMAINS:
             raise URLValidationError("URL is blocked")
         
-        # Normalize URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        return url
+        return url_str
     
-    def generate_short_key(self, db: Session) -> str:
-        """Generate unique short key"""
+    def generate_short_key(self) -> str:
+        """Generate a candidate short key; uniqueness is enforced on insert"""
+        return secrets.token_urlsafe(self.short_key_length)[:self.short_key_length]
+    
+    def _insert_link(self, db: Session, target_url: str, user_id: int) -> models.Link:
+        """Insert a link, retrying only when the short key is already taken"""
         for _ in range(self.max_generation_attempts):
-            short_key = secrets.token_urlsafe(self.short_key_length)[:self.short_key_length]
-            
-            # Check database for collision
-            existing = db.query(models.Link).filter_by(short_key=short_key).first()
-            if not existing:
-                return short_key
+            # The unique index on short_key arbitrates collisions atomically, even across workers
+            stmt = (
+                insert(models.Link)
+                .values(short_key=self.generate_short_key(), target_url=target_url, owner_id=user_id)
+                .on_conflict_do_nothing(index_elements=["short_key"])
+                .returning(models.Link)
+            )
+            db_link = db.scalars(stmt).first()
+            if db_link is not None:
+                return db_link
         
         raise Exception("Could not generate unique short key")
     
-    def create_link(self, db: Session, link_data: schemas.LinkCreate, user_id: int) -> models.Link:
+    def _get_or_insert_link(self, db: Session, target_url: str, user_id: int):
+        """Return the user's existing link for the URL, or insert and commit a new one"""
+        existing_link = db.query(models.Link).filter_by(
+            target_url=target_url,
+            owner_id=user_id
+        ).first()
+        if existing_link:
+            return existing_link, False
+        
+        # Create link under a fresh short key
+        db_link = self._insert_link(db, target_url, user_id)
+        db.commit()
+        return db_link, True
+    
+    async def create_link(self, db: Session, link_data: schemas.LinkCreate, user_id: int) -> models.Link:
         """Create a new short link"""
         try:
             # Validate URL
-            validated_url = self.validate_url(str(link_data.target_url))
-            
-            # Check for existing link by this user
-            existing_link = db.query(models.Link).filter_by(
-                target_url=validated_url,
-                owner_id=user_id
-            ).first()
-            
-            if existing_link:
-                logger.info(f"Returning existing link for {validated_url}")
-                return existing_link
+            validated_url = self.validate_url(link_data.target_url)
             
-            # Generate short key
-            short_key = self.generate_short_key(db)
-            
-            # Create link
-            db_link = models.Link(
-                short_key=short_key,
-                target_url=validated_url,
-                owner_id=user_id
+            # Session work runs in the threadpool so the event loop is never blocked on the DB
+            db_link, created = await run_in_threadpool(
+                self._get_or_insert_link, db, validated_url, user_id
             )
             
-            db.add(db_link)
-            db.commit()
-            db.refresh(db_link)
+            if not created:
+                logger.info(f"Returning existing link for {validated_url}")
+                return db_link
             
             # Cache immediately
-            link_cache.set_link(short_key, validated_url)
+            await link_cache.set_link(db_link.short_key, validated_url)
+            await link_cache.invalidate_user_links(user_id)
             
-            logger.info(f"Created link {short_key} -> {validated_url}")
+            logger.info(f"Created link {db_link.short_key} -> {validated_url}")
             return db_link
             
         except URLValidationError as e:
@@ -103,7 +106,7 @@ class LinkService:
             )
         except Exception as e:
             logger.error(f"Error creating link: {e}")
-            db.rollback()
+            await run_in_threadpool(db.rollback)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to create link"
@@ -111,16 +114,25 @@ class LinkService:
     
     def get_user_links(self, db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Link]:
         """Get paginated user links"""
-        return db.query(models.Link).filter_by(owner_id=user_id).offset(skip).limit(limit).all()
+        return (
+            db.query(models.Link)
+            .filter_by(owner_id=user_id)
+            .order_by(models.Link.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
     
-    def get_link_stats(self, db: Session, short_key: str) -> Optional[dict]:
+    async def get_link_stats(self, db: Session, short_key: str) -> Optional[dict]:
         """Get link statistics"""
-        link = db.query(models.Link).filter_by(short_key=short_key).first()
+        # Overlap the DB read (in the threadpool) with the real-time click count from Redis
+        link, redis_clicks = await asyncio.gather(
+            run_in_threadpool(db.query(models.Link).filter_by(short_key=short_key).first),
+            link_cache.get_clicks(short_key),
+        )
         if not link:
             return None
         
-        # Get real-time clicks from Redis
-        redis_clicks = link_cache.get_clicks(short_key)
         total_clicks = max(redis_clicks, link.clicks)
         
         return {
@@ -131,40 +143,36 @@ class LinkService:
             "owner_id": link.owner_id
         }
     
-    def redirect_link(self, db: Session, short_key: str) -> str:
+    async def redirect_link(self, db: Session, short_key: str) -> str:
         """Handle link redirection and click tracking"""
         # Try cache first
-        cached_link = link_cache.get_link(short_key)
+        cached_url = await link_cache.get_link(short_key)
         
-        if cached_link:
+        if cached_url:
             # Increment clicks in Redis
-            link_cache.increment_clicks(short_key)
-            return cached_link["target_url"]
-        
-        # Get from database
-        link = db.query(models.Link).filter_by(short_key=short_key).first()
-        if not link:
+            await link_cache.increment_clicks(short_key)
+            return cached_url
+        
+        # Get from database; only the target column is needed
+        target_url = await run_in_threadpool(
+            db.query(models.Link.target_url).filter_by(short_key=short_key).scalar
+        )
+        if target_url is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Link not found"
             )
         
         # Cache for future requests
-        link_cache.set_link(short_key, link.target_url)
-        
-        # Increment clicks
-        link_cache.increment_clicks(short_key)
+        await link_cache.set_link(short_key, target_url)
         
-        # Periodically sync with database (every 10 clicks)
-        redis_clicks = link_cache.get_clicks(short_key)
-        if redis_clicks % 10 == 0:
-            link.clicks = redis_clicks
-            db.commit()
+        # Increment clicks; the background flush writes them to the database
+        await link_cache.increment_clicks(short_key)
         
-        return link.target_url
+        return target_url
     
-    def delete_link(self, db: Session, short_key: str, user_id: int) -> bool:
-        """Delete a user's link"""
+    def _delete_link_row(self, db: Session, short_key: str, user_id: int) -> bool:
+        """Delete and commit a user's link row; False when the user has no such link"""
         link = db.query(models.Link).filter_by(
             short_key=short_key,
             owner_id=user_id
@@ -173,12 +181,19 @@ class LinkService:
         if not link:
             return False
         
-        # Remove from cache
-        link_cache.delete_link(short_key)
-        
-        # Delete from database
         db.delete(link)
         db.commit()
+        return True
+    
+    async def delete_link(self, db: Session, short_key: str, user_id: int) -> bool:
+        """Delete a user's link"""
+        # Delete from database in the threadpool so the event loop is never blocked on the DB
+        if not await run_in_threadpool(self._delete_link_row, db, short_key, user_id):
+            return False
+        
+        # Remove from cache only after the commit; a read in between would cache the old row again
+        await link_cache.delete_link(short_key)
+        await link_cache.invalidate_user_links(user_id)
         
         logger.info(f"Deleted link {short_key}")
         return True
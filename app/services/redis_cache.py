@@ -1,76 +1,312 @@
-from typing import Optional, Dict
-import json
-from app.redis_config import get_sync_redis_client
+import asyncio
+from typing import Dict, Optional, Tuple
+import orjson
+from cachetools import TTLCache
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+from app.redis_config import get_async_redis_client, get_sync_redis_client
 from app.logging_config import get_logger
 
 logger = get_logger("redis_cache")
 
 class LinkCache:
     def __init__(self):
-        self.redis = get_sync_redis_client()
+        self.redis: Optional[aioredis.Redis] = None
+        self._redis_loop: Optional[asyncio.AbstractEventLoop] = None
         self.cache_prefix = "link:"
         self.clicks_prefix = "clicks:"
+        self.dirty_clicks_key = "dirty_clicks"
+        self.user_links_prefix = "user_links:"
+        self.user_links_gen_prefix = "user_links_gen:"
+        self.id_seq_key = "links:id_seq"
+        self.id_seq_offset = 62 ** 5  # smallest 6-character base62 number
         self.cache_ttl = 3600  # 1 hour
+        self.user_links_ttl = 300  # 5 minutes; bounds how stale listed click counts can get
+        self.user_links_gen_ttl = 86400  # Far longer than any list read it has to outlive
+        self.invalidation_channel = "link:invalidate"
+        self.invalidation_retry_min_seconds = 1
+        self.invalidation_retry_max_seconds = 30
+        # In-process layer in front of Redis for hot keys; only touched from the event loop thread
+        self._local: TTLCache = TTLCache(maxsize=10_000, ttl=60)
         logger.info("Redis LinkCache initialized")
+    
+    def _client(self) -> aioredis.Redis:
+        """Return the async client, creating it for the running event loop on first use"""
+        loop = asyncio.get_running_loop()
+        if self.redis is None or self._redis_loop is not loop:
+            # Pooled connections belong to one loop; in production there is one loop per worker
+            self.redis = get_async_redis_client()
+            self._redis_loop = loop
+        return self.redis
+    
+    async def close(self) -> None:
+        """Close the pooled connections of the current client"""
+        if self.redis is not None:
+            await self.redis.close()
+            # The client does not own a pool it was handed, so disconnect it explicitly
+            await self.redis.connection_pool.disconnect()
+            self.redis = None
+            self._redis_loop = None
         
-    def get_link(self, short_key: str) -> Optional[Dict[str, any]]:
-        """Get link data from Redis cache"""
+    async def listen_for_invalidations(self) -> None:
+        """Drop local entries for links deleted by any worker, resubscribing after Redis errors"""
+        retry_delay = self.invalidation_retry_min_seconds
+        while True:
+            pubsub = self._client().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                # Deletes published while this worker was not subscribed were missed
+                self._local.clear()
+                retry_delay = self.invalidation_retry_min_seconds
+                async for message in pubsub.listen():
+                    self._local.pop(message["data"], None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"🔥 Redis invalidation listener failed, resubscribing in {retry_delay}s: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, self.invalidation_retry_max_seconds)
+    
+    def _keys(self, short_key: str) -> Tuple[str, str]:
+        """Return the (link, clicks) Redis keys for a short key"""
+        return self.cache_prefix + short_key, self.clicks_prefix + short_key
+    
+    def _decode_target_url(self, data: str) -> str:
+        # Entries written before bare URLs were stored hold {"target_url": ...}; no URL starts with "{"
+        return orjson.loads(data)["target_url"] if data[0] == "{" else data
+    
+    async def get_link(self, short_key: str) -> Optional[str]:
+        """Get a link's target URL from the local cache, falling back to Redis"""
+        local = self._local.get(short_key)
+        if local is not None:
+            return local
         try:
-            data = self.redis.get(f"{self.cache_prefix}{short_key}")
+            data = await self._client().get(self.cache_prefix + short_key)
             if data:
-                logger.info(f"✅ CACHE HIT: {short_key} -> Retrieved from Redis")
-                return json.loads(data)
+                logger.debug("✅ CACHE HIT: %s -> Retrieved from Redis", short_key)
+                target_url = self._decode_target_url(data)
+                self._local[short_key] = target_url
+                return target_url
             else:
-                logger.info(f"❌ CACHE MISS: {short_key} -> Not found in Redis")
+                logger.debug("❌ CACHE MISS: %s -> Not found in Redis", short_key)
         except Exception as e:
             logger.error(f"🔥 Redis ERROR for {short_key}: {e}")
         return None
     
-    def set_link(self, short_key: str, target_url: str) -> None:
-        """Cache link target URL in Redis"""
+    async def set_link(self, short_key: str, target_url: str) -> None:
+        """Cache link target URL in Redis as a bare string"""
+        self._local[short_key] = target_url
         try:
-            cache_data = {"target_url": target_url}
-            self.redis.setex(
-                f"{self.cache_prefix}{short_key}",
-                self.cache_ttl,
-                json.dumps(cache_data)
-            )
-            logger.info(f"💾 CACHED: {short_key} -> {target_url} (TTL: {self.cache_ttl}s)")
+            await self._client().setex(self.cache_prefix + short_key, self.cache_ttl, target_url)
+            logger.debug("💾 CACHED: %s -> %s (TTL: %ss)", short_key, target_url, self.cache_ttl)
         except Exception as e:
             logger.error(f"🔥 Redis SET failed for {short_key}: {e}")
     
-    def delete_link(self, short_key: str) -> None:
+    async def delete_link(self, short_key: str) -> None:
         """Remove link from cache"""
+        self._local.pop(short_key, None)
         try:
-            self.redis.delete(f"{self.cache_prefix}{short_key}")
-            self.redis.delete(f"{self.clicks_prefix}{short_key}")
+            await self._client().delete(*self._keys(short_key))
+            # Other workers drop their local copy too
+            await self._client().publish(self.invalidation_channel, short_key)
             logger.info(f"🗑️  DELETED: {short_key} removed from cache")
         except Exception as e:
             logger.error(f"🔥 Redis DELETE failed for {short_key}: {e}")
     
-    def increment_clicks(self, short_key: str) -> int:
+    async def increment_clicks(self, short_key: str) -> int:
         """Increment and get click count in Redis"""
         try:
-            # Increment click counter
-            new_count = self.redis.incr(f"{self.clicks_prefix}{short_key}")
-            # Set expiration to match cache TTL
-            self.redis.expire(f"{self.clicks_prefix}{short_key}", self.cache_ttl)
-            logger.info(f"📈 CLICK: {short_key} -> Click #{new_count}")
+            key = f"{self.clicks_prefix}{short_key}"
+            # Increment click counter, set expiration to match cache TTL and mark it for the
+            # next DB flush in one round trip
+            async with self._client().pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, self.cache_ttl)
+                pipe.sadd(self.dirty_clicks_key, short_key)
+                new_count, _, _ = await pipe.execute()
+            logger.debug("📈 CLICK: %s -> Click #%s", short_key, new_count)
             return new_count
         except Exception as e:
             logger.error(f"🔥 Redis INCREMENT failed for {short_key}: {e}")
             return 0
     
-    def get_clicks(self, short_key: str) -> int:
+    async def seed_clicks(self, short_key: str, clicks: int) -> None:
+        """Initialize the Redis click counter from the DB value unless it already exists"""
+        try:
+            # NX: never clobber a counter that concurrent hits already started incrementing
+            await self._client().set(f"{self.clicks_prefix}{short_key}", clicks, ex=self.cache_ttl, nx=True)
+            logger.debug("🌱 SEEDED: %s -> %s clicks", short_key, clicks)
+        except Exception as e:
+            logger.error(f"🔥 Redis SEED CLICKS failed for {short_key}: {e}")
+    
+    async def pop_dirty_clicks(self, count: int = 1000) -> Dict[str, int]:
+        """Take up to `count` links with unflushed clicks and return their current counters"""
+        try:
+            short_keys = await self._client().spop(self.dirty_clicks_key, count)
+        except Exception as e:
+            logger.error(f"🔥 Redis POP DIRTY CLICKS failed: {e}")
+            return {}
+        if not short_keys:
+            return {}
+        try:
+            clicks = await self._client().mget([f"{self.clicks_prefix}{k}" for k in short_keys])
+        except Exception as e:
+            # The keys already left the dirty set; queue them again or their clicks are never flushed
+            logger.error(f"🔥 Redis GET DIRTY CLICKS failed for {len(short_keys)} links: {e}")
+            await self.mark_clicks_dirty(short_keys)
+            return {}
+        return {k: int(c) for k, c in zip(short_keys, clicks) if c is not None}
+    
+    async def mark_clicks_dirty(self, short_keys) -> None:
+        """Queue links for the next flush again, e.g. after a failed DB write"""
+        try:
+            await self._client().sadd(self.dirty_clicks_key, *short_keys)
+        except Exception as e:
+            logger.error(f"🔥 Redis MARK DIRTY CLICKS failed: {e}")
+    
+    async def get_link_and_clicks(self, short_key: str) -> Tuple[Optional[str], int]:
+        """Get a cached target URL and click count from Redis in a single MGET"""
+        try:
+            data, clicks = await self._client().mget(self._keys(short_key))
+            return (self._decode_target_url(data) if data else None), (int(clicks) if clicks else 0)
+        except Exception as e:
+            logger.error(f"🔥 Redis GET LINK AND CLICKS failed for {short_key}: {e}")
+            return None, 0
+    
+    async def get_clicks(self, short_key: str) -> int:
         """Get current click count from Redis"""
         try:
-            clicks = self.redis.get(f"{self.clicks_prefix}{short_key}")
+            clicks = await self._client().get(f"{self.clicks_prefix}{short_key}")
             count = int(clicks) if clicks else 0
-            logger.debug(f"📊 CLICKS: {short_key} has {count} clicks in Redis")
+            logger.debug("📊 CLICKS: %s has %s clicks in Redis", short_key, count)
             return count
         except Exception as e:
             logger.error(f"🔥 Redis GET CLICKS failed for {short_key}: {e}")
             return 0
 
-# Create singleton instance
-link_cache = LinkCache()
\ No newline at end of file
+    async def next_link_number(self) -> Optional[int]:
+        """Allocate a globally unique link number, or None when Redis is unavailable"""
+        try:
+            return self.id_seq_offset + await self._client().incr(self.id_seq_key)
+        except Exception as e:
+            logger.error(f"🔥 Redis INCR failed for {self.id_seq_key}: {e}")
+            return None
+    
+    async def seed_link_numbers(self, last_number: int) -> None:
+        """Move the link number sequence past `last_number`; it is never moved backwards"""
+        floor = last_number - self.id_seq_offset
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(self.id_seq_key)
+                        current = await pipe.get(self.id_seq_key)
+                        if current is not None and int(current) >= floor:
+                            return
+                        pipe.multi()
+                        pipe.set(self.id_seq_key, floor)
+                        await pipe.execute()
+                        logger.info(f"🌱 SEEDED: {self.id_seq_key} -> {floor}")
+                        return
+                    except WatchError:
+                        # A link was created meanwhile; check the new value again
+                        continue
+        except Exception as e:
+            logger.error(f"🔥 Redis SEED failed for {self.id_seq_key}: {e}")
+    
+    def _user_links_keys(self, user_id: int) -> Tuple[str, str]:
+        """Return the (list, generation) Redis keys for a user's cached link list"""
+        return f"{self.user_links_prefix}{user_id}", f"{self.user_links_gen_prefix}{user_id}"
+    
+    async def get_user_links(self, user_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """Get a user's link list from Redis as the JSON response body, plus its generation
+        
+        The generation must be passed back to set_user_links so a list read from the DB
+        before a concurrent invalidation is never cached.
+        """
+        try:
+            data, generation = await self._client().mget(self._user_links_keys(user_id))
+            return data, generation or "0"
+        except Exception as e:
+            logger.error(f"🔥 Redis GET USER LINKS failed for user {user_id}: {e}")
+        return None, None
+    
+    async def set_user_links(self, user_id: int, links_json: bytes, generation: Optional[str]) -> None:
+        """Cache a user's link list as an already serialized JSON body
+        
+        Skipped when the list was invalidated after `generation` was read.
+        """
+        if generation is None:
+            return
+        key, gen_key = self._user_links_keys(user_id)
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                # EXEC aborts if an invalidation bumps the generation between the check and SET
+                await pipe.watch(gen_key)
+                if (await pipe.get(gen_key) or "0") != generation:
+                    return
+                pipe.multi()
+                pipe.set(key, links_json, ex=self.user_links_ttl)
+                await pipe.execute()
+        except WatchError:
+            logger.debug("User links for user %s changed while loading; not cached", user_id)
+        except Exception as e:
+            logger.error(f"🔥 Redis SET USER LINKS failed for user {user_id}: {e}")
+    
+    async def invalidate_user_links(self, user_id: int) -> None:
+        """Drop a user's cached link list after one of their links changed"""
+        key, gen_key = self._user_links_keys(user_id)
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                pipe.incr(gen_key)
+                pipe.expire(gen_key, self.user_links_gen_ttl)
+                pipe.delete(key)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"🔥 Redis INVALIDATE USER LINKS failed for user {user_id}: {e}")
+
+class UserCache:
+    def __init__(self):
+        self.redis = get_sync_redis_client()
+        self.cache_prefix = "u:email:"
+        self.cache_ttl = 60  # Short TTL: rows are also invalidated on change
+        logger.info("Redis UserCache initialized")
+    
+    def get_user(self, email: str) -> Optional[Dict[str, any]]:
+        """Get cached user row fields from Redis"""
+        try:
+            data = self.redis.get(f"{self.cache_prefix}{email}")
+            if data:
+                return orjson.loads(data)
+        except Exception as e:
+            logger.error(f"🔥 Redis USER GET failed for {email}: {e}")
+        return None
+    
+    def set_user(self, user) -> None:
+        """Cache the user row fields needed for authentication"""
+        try:
+            cache_data = {
+                "id": user.id,
+                "email": user.email,
+                "hashed_password": user.hashed_password,
+            }
+            self.redis.setex(
+                f"{self.cache_prefix}{user.email}",
+                self.cache_ttl,
+                orjson.dumps(cache_data)
+            )
+        except Exception as e:
+            logger.error(f"🔥 Redis USER SET failed for {user.email}: {e}")
+    
+    def delete_user(self, email: str) -> None:
+        """Invalidate a cached user row"""
+        try:
+            self.redis.delete(f"{self.cache_prefix}{email}")
+        except Exception as e:
+            logger.error(f"🔥 Redis USER DELETE failed for {email}: {e}")
+
+# Create singleton instances
+link_cache = LinkCache()
+user_cache = UserCache()
\ No newline at end of file
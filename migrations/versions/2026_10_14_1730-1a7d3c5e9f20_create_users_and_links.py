@@ -0,0 +1,56 @@
+"""create users and links tables
+
+Revision ID: 1a7d3c5e9f20
+Revises:
+Create Date: 2026-10-14 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "1a7d3c5e9f20"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases set up before migrations existed got these tables from create_all() at app startup
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing_tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"], unique=False)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "links" not in existing_tables:
+        op.create_table(
+            "links",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("short_key", sa.String(length=20), nullable=False),
+            sa.Column("target_url", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("clicks", sa.Integer(), nullable=True),
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_links_id", "links", ["id"], unique=False)
+        op.create_index("ix_links_short_key", "links", ["short_key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_short_key", table_name="links")
+    op.drop_index("ix_links_id", table_name="links")
+    op.drop_table("links")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
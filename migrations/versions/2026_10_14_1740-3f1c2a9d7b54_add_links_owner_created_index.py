@@ -0,0 +1,26 @@
+"""add links owner_id, created_at index
+
+Revision ID: 3f1c2a9d7b54
+Revises: 1a7d3c5e9f20
+Create Date: 2026-10-14 17:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3f1c2a9d7b54"
+down_revision = "1a7d3c5e9f20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all() already builds this index for tables it creates from the current models
+    op.create_index(
+        "ix_links_owner_created", "links", ["owner_id", "created_at"], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_owner_created", table_name="links")
@@ -0,0 +1,26 @@
+"""add links owner_id, target_url index
+
+Revision ID: 8b2e4f6a1c90
+Revises: 3f1c2a9d7b54
+Create Date: 2026-10-14 18:15:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "8b2e4f6a1c90"
+down_revision = "3f1c2a9d7b54"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all() already builds this index for tables it creates from the current models
+    op.create_index(
+        "ix_links_owner_target", "links", ["owner_id", "target_url"], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_owner_target", table_name="links")
@@ -1,6 +1,7 @@
 """
 End-to-end tests for complete user workflows
 """
+import asyncio
 import pytest
 import time
 from fastapi.testclient import TestClient
@@ -59,7 +60,7 @@ class TestUserWorkflows:
         
         # Step 5: Test redirection for each link
         for i, link in enumerate(created_links):
-            redirect_response = client.get(f"/{link['short_key']}", follow_redirects=False)
+            redirect_response = client.get(f"/{link['short_key']}")
             assert redirect_response.status_code in [307, 308]
             assert redirect_response.headers["location"] == urls_to_shorten[i]
         
@@ -70,23 +71,14 @@ class TestUserWorkflows:
             stats = stats_response.json()
             assert stats["clicks"] == 1  # Each link was clicked once
 
-    def test_anonymous_user_workflow(self, client):
+    def test_anonymous_user_workflow(self, client, shared_auth):
         """Test what anonymous users can and cannot do"""
         # Anonymous users should be able to:
         # 1. Access redirect links (if they have the short key)
         # 2. View link statistics (public information)
         
         # First, create a link with authenticated user for testing
-        signup_response = client.post("/auth/signup", json={
-            "email": "link_creator@example.com",
-            "password": "Password123"
-        })
-        login_response = client.post("/auth/token", data={
-            "username": "link_creator@example.com",
-            "password": "Password123"
-        })
-        token = login_response.json()["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = shared_auth["headers"]
         
         create_response = client.post("/links/",
             json={"target_url": "https://example.com/public-link"},
@@ -96,7 +88,7 @@ class TestUserWorkflows:
         
         # Now test as anonymous user
         # Should be able to use redirect
-        redirect_response = client.get(f"/{short_key}", follow_redirects=False)
+        redirect_response = client.get(f"/{short_key}")
         assert redirect_response.status_code in [307, 308]
         assert redirect_response.headers["location"] == "https://example.com/public-link"
         
@@ -114,28 +106,19 @@ class TestUserWorkflows:
         my_links_response = client.get("/links/me")
         assert my_links_response.status_code == 401
 
-    def test_multiple_users_isolation(self, client):
+    def test_multiple_users_isolation(self, client, token_for):
         """Test that multiple users' data is properly isolated"""
-        # Create two users
+        # Two users; signup and login themselves are covered by test_complete_user_journey
         users = [
-            {"email": "user1@example.com", "password": "Password123"},
-            {"email": "user2@example.com", "password": "Password123"}
+            {"email": "isolation_user1@example.com", "password": "Password123"},
+            {"email": "isolation_user2@example.com", "password": "Password123"}
         ]
         
         user_tokens = []
         user_links = []
         
         for user in users:
-            # Signup
-            signup_response = client.post("/auth/signup", json=user)
-            assert signup_response.status_code == 200
-            
-            # Login
-            login_response = client.post("/auth/token", data={
-                "username": user["email"],
-                "password": user["password"]
-            })
-            token = login_response.json()["access_token"]
+            token = token_for(user["email"], user["password"])
             user_tokens.append(token)
             
             # Create links for each user
@@ -159,19 +142,10 @@ class TestUserWorkflows:
             for link in my_links:
                 assert users[i]["email"] in link["target_url"]
 
-    def test_link_sharing_workflow(self, client):
+    def test_link_sharing_workflow(self, client, shared_auth):
         """Test workflow of sharing links between users"""
         # User A creates a link
-        signup_a = client.post("/auth/signup", json={
-            "email": "user_a@example.com",
-            "password": "Password123"
-        })
-        login_a = client.post("/auth/token", data={
-            "username": "user_a@example.com",
-            "password": "Password123"
-        })
-        token_a = login_a.json()["access_token"]
-        headers_a = {"Authorization": f"Bearer {token_a}"}
+        headers_a = shared_auth["headers"]
         
         create_response = client.post("/links/",
             json={"target_url": "https://example.com/shared-content"},
@@ -187,7 +161,7 @@ class TestUserWorkflows:
         })
         
         # User B can still use the shared link (anonymous access)
-        redirect_response = client.get(f"/{short_key}", follow_redirects=False)
+        redirect_response = client.get(f"/{short_key}")
         assert redirect_response.status_code in [307, 308]
         assert redirect_response.headers["location"] == "https://example.com/shared-content"
         
@@ -196,96 +170,67 @@ class TestUserWorkflows:
         assert stats_response.status_code == 200
         assert stats_response.json()["clicks"] == 1
 
-    def test_high_frequency_usage_workflow(self, client):
+    @pytest.mark.asyncio
+    async def test_high_frequency_usage_workflow(self, async_client, shared_auth):
         """Test workflow with high frequency link usage"""
         # Create user and link
-        client.post("/auth/signup", json={
-            "email": "heavy_user@example.com",
-            "password": "Password123"
-        })
-        login_response = client.post("/auth/token", data={
-            "username": "heavy_user@example.com",
-            "password": "Password123"
-        })
-        token = login_response.json()["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = shared_auth["headers"]
         
-        create_response = client.post("/links/",
+        create_response = await async_client.post("/links/",
             json={"target_url": "https://example.com/popular-content"},
             headers=headers
         )
         short_key = create_response.json()["short_key"]
         
-        # Simulate high frequency usage
+        # Simulate high frequency usage; the clicks interleave in the app instead of queueing
         click_count = 50
-        for i in range(click_count):
-            redirect_response = client.get(f"/{short_key}", follow_redirects=False)
-            assert redirect_response.status_code in [307, 308]
+        url = f"/{short_key}"
+        redirect_responses = await asyncio.gather(*[
+            async_client.get(url) for _ in range(click_count)
+        ])
+        codes = [response.status_code for response in redirect_responses]
+        assert set(codes) <= {307, 308}, f"Unexpected status codes: {codes}"
         
         # Verify click count is accurate
-        stats_response = client.get(f"/links/{short_key}/stats")
+        stats_response = await async_client.get(f"/links/{short_key}/stats")
         stats = stats_response.json()
         assert stats["clicks"] == click_count
 
-    def test_concurrent_user_workflow(self, client):
+    @pytest.mark.asyncio
+    async def test_concurrent_user_workflow(self, async_client, shared_auth):
         """Test workflow with concurrent user actions"""
-        import threading
-        import time
-        
         # Create a shared link first
-        client.post("/auth/signup", json={
-            "email": "concurrent_test@example.com",
-            "password": "Password123"
-        })
-        login_response = client.post("/auth/token", data={
-            "username": "concurrent_test@example.com",
-            "password": "Password123"
-        })
-        token = login_response.json()["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = shared_auth["headers"]
         
-        create_response = client.post("/links/",
+        create_response = await async_client.post("/links/",
             json={"target_url": "https://example.com/concurrent-test"},
             headers=headers
         )
         short_key = create_response.json()["short_key"]
         
-        # Define concurrent click function
-        results = []
-        
-        def click_link():
-            try:
-                response = client.get(f"/{short_key}", follow_redirects=False)
-                results.append(response.status_code)
-            except Exception as e:
-                results.append(f"Error: {e}")
-        
-        # Start multiple threads to click simultaneously
-        threads = []
-        thread_count = 10
-        
-        for i in range(thread_count):
-            thread = threading.Thread(target=click_link)
-            threads.append(thread)
-        
-        # Start all threads
-        for thread in threads:
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        # Click simultaneously; the requests overlap in the app and in Redis
+        click_count = 10
+        url = f"/{short_key}"
+        results = await asyncio.gather(*[
+            async_client.get(url) for _ in range(click_count)
+        ])
         
         # Verify all requests succeeded
-        assert len(results) == thread_count
-        for result in results:
-            assert result in [307, 308], f"Unexpected result: {result}"
-        
-        # Verify final click count
-        time.sleep(1)  # Give time for Redis updates
-        stats_response = client.get(f"/links/{short_key}/stats")
-        stats = stats_response.json()
-        assert stats["clicks"] == thread_count
+        codes = [result.status_code for result in results]
+        assert len(codes) == click_count
+        assert set(codes) <= {307, 308}, f"Unexpected results: {codes}"
+        
+        # Verify final click count, polling with backoff instead of sleeping a fixed second
+        deadline = time.monotonic() + 2
+        delay = 0.005
+        while True:
+            stats_response = await async_client.get(f"/links/{short_key}/stats")
+            stats = stats_response.json()
+            if stats["clicks"] == click_count or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        assert stats["clicks"] == click_count
 
 
 @pytest.mark.e2e
@@ -293,21 +238,12 @@ class TestUserWorkflows:
 class TestSystemReliability:
     """Test system reliability and edge cases"""
 
-    def test_system_handles_invalid_data_gracefully(self, client):
+    def test_system_handles_invalid_data_gracefully(self, client, shared_auth):
         """Test system handles various invalid inputs gracefully"""
         # Test with very long URLs
         very_long_url = "https://example.com/" + "x" * 10000
         
-        client.post("/auth/signup", json={
-            "email": "edge_case_user@example.com",
-            "password": "Password123"
-        })
-        login_response = client.post("/auth/token", data={
-            "username": "edge_case_user@example.com",
-            "password": "Password123"
-        })
-        token = login_response.json()["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = shared_auth["headers"]
         
         # Should handle gracefully (either accept or reject predictably)
         response = client.post("/links/",
@@ -327,9 +263,7 @@ class TestSystemReliability:
     def test_system_performance_under_load(self, client):
         """Test basic system performance under simulated load"""
         # Create multiple users and links rapidly
-        import time
-        
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         for i in range(10):
             # Create user
@@ -355,25 +289,16 @@ class TestSystemReliability:
                 )
                 assert create_response.status_code == 201
         
-        end_time = time.time()
+        end_time = time.perf_counter()
         total_time = end_time - start_time
         
         # Should complete within reasonable time (adjust based on requirements)
         assert total_time < 30, f"Load test took {total_time:.2f} seconds"
 
-    def test_database_consistency_after_operations(self, client):
+    def test_database_consistency_after_operations(self, client, shared_auth):
         """Test database remains consistent after various operations"""
         # Create user and perform various operations
-        client.post("/auth/signup", json={
-            "email": "consistency_user@example.com",
-            "password": "Password123"
-        })
-        login_response = client.post("/auth/token", data={
-            "username": "consistency_user@example.com",
-            "password": "Password123"
-        })
-        token = login_response.json()["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = shared_auth["headers"]
         
         # Create links
         created_links = []
@@ -387,7 +312,7 @@ class TestSystemReliability:
         # Use links multiple times
         for link in created_links:
             for _ in range(3):
-                client.get(f"/{link['short_key']}", follow_redirects=False)
+                client.get(f"/{link['short_key']}")
         
         # Verify data consistency
         my_links_response = client.get("/links/me", headers=headers)
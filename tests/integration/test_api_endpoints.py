@@ -1,11 +1,13 @@
 """
 Integration tests for API endpoints
 """
+import itertools
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 
-from app.main import app
+from app import crud
+from app.main import app, flush_dirty_clicks
 
 
 @pytest.mark.integration
@@ -217,15 +219,28 @@ class TestLinkRedirection:
         short_key = response.json()["short_key"]
         
         # Follow redirect
-        response = client.get(f"/{short_key}", follow_redirects=False)
+        response = client.get(f"/{short_key}")
         
         assert response.status_code in [307, 308]  # Temporary or Permanent Redirect
         assert "location" in response.headers
         assert response.headers["location"] == "https://example.com/redirect-test"
 
+    def test_redirect_not_cacheable_by_shared_caches(self, client, authenticated_user):
+        """Test that redirects are marked private so every hit reaches the API"""
+        response = client.post("/links/",
+            json={"target_url": "https://example.com/private"},
+            headers=authenticated_user["headers"]
+        )
+        short_key = response.json()["short_key"]
+
+        response = client.get(f"/{short_key}")
+
+        assert response.status_code == 307
+        assert response.headers["cache-control"] == "private, max-age=0"
+
     def test_redirect_not_found(self, client):
         """Test redirection for non-existent short key"""
-        response = client.get("/nonexistent", follow_redirects=False)
+        response = client.get("/nonexistent")
         
         assert response.status_code == 404
 
@@ -243,7 +258,7 @@ class TestLinkRedirection:
         initial_clicks = stats_response.json()["clicks"]
         
         # Click the link
-        client.get(f"/{short_key}", follow_redirects=False)
+        client.get(f"/{short_key}")
         
         # Check updated stats
         stats_response = client.get(f"/links/{short_key}/stats")
@@ -262,7 +277,7 @@ class TestLinkRedirection:
         
         # Click multiple times
         for i in range(5):
-            client.get(f"/{short_key}", follow_redirects=False)
+            client.get(f"/{short_key}")
         
         # Check final stats
         stats_response = client.get(f"/links/{short_key}/stats")
@@ -288,6 +303,70 @@ class TestRedisIntegration:
         cached_data = fake_redis.get(f"link:{short_key}")
         assert cached_data is not None
 
+    def test_cached_link_is_bare_url(self, client, authenticated_user, fake_redis):
+        """Test that the cache stores the target URL itself, not a JSON wrapper"""
+        response = client.post("/links/",
+            json={"target_url": "https://example.com/bare"},
+            headers=authenticated_user["headers"]
+        )
+        short_key = response.json()["short_key"]
+
+        assert fake_redis.get(f"link:{short_key}") == "https://example.com/bare"
+
+    def test_redirect_reads_legacy_json_cache_entry(self, client, fake_redis):
+        """Test that entries cached in the old JSON format still redirect"""
+        fake_redis.set("link:legacy1", '{"target_url": "https://example.com/legacy"}')
+
+        response = client.get("/legacy1")
+
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://example.com/legacy"
+
+    def test_short_keys_come_from_redis_sequence(self, client, authenticated_user, fake_redis):
+        """Test that new links get consecutive base62 keys from the Redis counter"""
+        keys = [
+            client.post("/links/",
+                json={"target_url": f"https://example.com/seq-{i}"},
+                headers=authenticated_user["headers"]
+            ).json()["short_key"]
+            for i in range(2)
+        ]
+
+        assert keys == [crud.base62_encode(62 ** 5 + 1), crud.base62_encode(62 ** 5 + 2)]
+
+    def test_lost_sequence_reseeded_past_taken_keys(self, client, authenticated_user, fake_redis):
+        """Test that a sequence reset by a Redis flush is moved past the keys already in the DB"""
+        def create():
+            return client.post("/links/",
+                json={"target_url": "https://example.com/reseed"},
+                headers=authenticated_user["headers"]
+            ).json()["short_key"]
+
+        create()
+        create()
+        fake_redis.delete("links:id_seq")
+
+        # The first key after the reset is taken and falls back to a random key
+        assert create() not in (crud.base62_encode(62 ** 5 + 1), crud.base62_encode(62 ** 5 + 2))
+        assert create() == crud.base62_encode(62 ** 5 + 3)
+
+    def test_user_links_invalidated_during_read_not_cached(self, client, authenticated_user, fake_redis, monkeypatch):
+        """Test that a list read before a concurrent invalidation is not written back"""
+        user_id = authenticated_user["user"].id
+        get_user_links = crud.get_user_links
+
+        def racing_get_user_links(db, uid):
+            links = get_user_links(db, uid)
+            # Another request creates a link after this one has read the list
+            fake_redis.incr(f"user_links_gen:{uid}")
+            return links
+
+        monkeypatch.setattr(crud, "get_user_links", racing_get_user_links)
+        response = client.get("/links/me", headers=authenticated_user["headers"])
+
+        assert response.json() == []
+        assert fake_redis.get(f"user_links:{user_id}") is None
+
     def test_redirect_uses_cache(self, client, authenticated_user, fake_redis):
         """Test that redirection uses cache when available"""
         # Create a link
@@ -298,11 +377,11 @@ class TestRedisIntegration:
         short_key = response.json()["short_key"]
         
         # First redirect (should cache)
-        response1 = client.get(f"/{short_key}", follow_redirects=False)
+        response1 = client.get(f"/{short_key}")
         assert response1.status_code in [307, 308]
         
         # Second redirect (should use cache)
-        response2 = client.get(f"/{short_key}", follow_redirects=False)
+        response2 = client.get(f"/{short_key}")
         assert response2.status_code in [307, 308]
         assert response2.headers["location"] == "https://example.com/cache-redirect"
 
@@ -317,12 +396,89 @@ class TestRedisIntegration:
         
         # Click the link multiple times
         for i in range(3):
-            client.get(f"/{short_key}", follow_redirects=False)
+            client.get(f"/{short_key}")
         
         # Check Redis click count
         redis_clicks = fake_redis.get(f"clicks:{short_key}")
         assert int(redis_clicks) == 3
 
+    def test_redirect_served_from_local_cache(self, client, authenticated_user, fake_redis):
+        """Test that hot keys are answered in-process without reading Redis"""
+        response = client.post("/links/",
+            json={"target_url": "https://example.com/local-cache"},
+            headers=authenticated_user["headers"]
+        )
+        short_key = response.json()["short_key"]
+        fake_redis.delete(f"link:{short_key}")
+
+        response = client.get(f"/{short_key}")
+
+        assert response.status_code in [307, 308]
+        assert response.headers["location"] == "https://example.com/local-cache"
+        assert fake_redis.get(f"link:{short_key}") is None
+
+    def test_cache_miss_seeds_click_counter(self, client, db_session, test_data_manager, fake_redis):
+        """Test that a cache miss seeds the Redis counter from the DB in one write"""
+        user = test_data_manager.create_test_user(db_session)
+        link = test_data_manager.create_test_link(db_session, user, "https://example.com/seeded")
+        link.clicks = 41
+        db_session.commit()
+
+        response = client.get(f"/{link.short_key}")
+
+        assert response.status_code in [307, 308]
+        assert int(fake_redis.get(f"clicks:{link.short_key}")) == 42
+
+    def test_link_stats_from_redis_skips_db(self, client, authenticated_user, fake_redis):
+        """Test that stats for a cached link with a live counter come from Redis alone"""
+        response = client.post("/links/",
+            json={"target_url": "https://example.com/stats-cache"},
+            headers=authenticated_user["headers"]
+        )
+        short_key = response.json()["short_key"]
+        for _ in range(2):
+            client.get(f"/{short_key}")
+
+        with patch("app.crud.get_link_stats") as mock_get_link_stats:
+            response = client.get(f"/links/{short_key}/stats")
+
+        assert response.status_code == 200
+        assert response.json()["clicks"] == 2
+        mock_get_link_stats.assert_not_called()
+
+    def test_user_links_cached_and_invalidated(self, client, authenticated_user, fake_redis):
+        """Test that /links/me is served from Redis until the user creates a link"""
+        headers = authenticated_user["headers"]
+        user_id = authenticated_user["user"].id
+        # An empty list is cached too
+        assert client.get("/links/me", headers=headers).json() == []
+        assert fake_redis.get(f"user_links:{user_id}") == "[]"
+
+        client.post("/links/", json={"target_url": "https://example.com/one"}, headers=headers)
+        assert fake_redis.get(f"user_links:{user_id}") is None
+
+        first = client.get("/links/me", headers=headers).json()
+        assert fake_redis.get(f"user_links:{user_id}") is not None
+        assert client.get("/links/me", headers=headers).json() == first
+
+        client.post("/links/", json={"target_url": "https://example.com/two"}, headers=headers)
+        assert fake_redis.get(f"user_links:{user_id}") is None
+        assert len(client.get("/links/me", headers=headers).json()) == 2
+
+    def test_dirty_clicks_flushed_to_db(self, client, db_session, test_data_manager, fake_redis):
+        """Test that clicks counted in Redis reach the database on the next flush"""
+        user = test_data_manager.create_test_user(db_session)
+        link = test_data_manager.create_test_link(db_session, user, "https://example.com/flushed")
+
+        for _ in range(3):
+            client.get(f"/{link.short_key}")
+        # Run on the app's event loop, where the async Redis client lives
+        client.portal.call(flush_dirty_clicks)
+
+        db_session.expire(link, ['clicks'])
+        assert link.clicks == 3
+        assert fake_redis.scard("dirty_clicks") == 0
+
 
 @pytest.mark.integration
 class TestErrorHandling:
@@ -379,49 +535,38 @@ class TestErrorHandling:
 class TestPerformanceBaseline:
     """Basic performance tests to establish baselines"""
 
-    def test_signup_performance(self, client):
+    def test_signup_performance(self, client, benchmark):
         """Test signup endpoint performance"""
-        import time
-        
-        start_time = time.time()
-        response = client.post("/auth/signup", json={
-            "email": "perf_test@example.com",
-            "password": "Password123"
-        })
-        end_time = time.time()
-        
+        emails = (f"perf_test_{i}@example.com" for i in itertools.count())
+
+        def signup_args():
+            # Every round signs up a new email; a repeat would be rejected as already registered
+            return ("/auth/signup",), {"json": {"email": next(emails), "password": "Password123"}}
+
+        response = benchmark.pedantic(client.post, setup=signup_args, rounds=10, warmup_rounds=1)
+
         assert response.status_code == 200
-        assert (end_time - start_time) < 1.0  # Should complete within 1 second
 
-    def test_link_creation_performance(self, client, authenticated_user):
+    def test_link_creation_performance(self, client, authenticated_user, benchmark):
         """Test link creation endpoint performance"""
-        import time
-        
-        start_time = time.time()
-        response = client.post("/links/",
+        response = benchmark(
+            client.post,
+            "/links/",
             json={"target_url": "https://example.com/perf-test"},
             headers=authenticated_user["headers"]
         )
-        end_time = time.time()
-        
+
         assert response.status_code == 201
-        assert (end_time - start_time) < 1.0  # Should complete within 1 second (adjusted for containerized environment)
 
-    def test_redirect_performance(self, client, authenticated_user):
+    def test_redirect_performance(self, client, authenticated_user, benchmark):
         """Test redirect endpoint performance"""
-        import time
-        
         # Create a link
         response = client.post("/links/",
             json={"target_url": "https://example.com/perf-redirect"},
             headers=authenticated_user["headers"]
         )
-        short_key = response.json()["short_key"]
-        
-        # Test redirect performance
-        start_time = time.time()
-        response = client.get(f"/{short_key}", follow_redirects=False)
-        end_time = time.time()
-        
+        url = f"/{response.json()['short_key']}"
+
+        response = benchmark(client.get, url)
+
         assert response.status_code in [307, 308]
-        assert (end_time - start_time) < 0.1  # Should complete within 100ms
@@ -1,26 +1,91 @@
 """
 Performance tests using Locust for load testing
 """
-from locust import HttpUser, task, between
+from collections import deque
+from uuid import uuid4
+from gevent.pool import Group, Pool
+from locust import HttpUser, task, between, events
+from locust.runners import MasterRunner
 import random
+import requests
 import string
 import json
 
 
+SEED_LINK_COUNT = 1000
+USER_NAME_POOL_SIZE = 10_000
+
+# Unique email suffixes, generated once at test start instead of per spawned user
+user_name_pool = deque()
+
+# Short keys of real links, created once per runner at test start for AnonymousUser
+seed_link_keys = []
+
+
+@events.test_start.add_listener
+def preallocate_user_names(environment, **kwargs):
+    """Fill the name pool before users spawn; uuid4 keeps names unique across runners"""
+    if isinstance(environment.runner, MasterRunner):
+        return
+    user_name_pool.extend(uuid4().hex[:12] for _ in range(USER_NAME_POOL_SIZE))
+
+
+def next_user_name():
+    """Take a preallocated unique name, generating one if the pool has run dry"""
+    try:
+        return user_name_pool.popleft()
+    except IndexError:
+        return uuid4().hex[:12]
+
+
+@events.test_start.add_listener
+def seed_links(environment, **kwargs):
+    """Create real links up front so anonymous traffic hits the redirect path, not the 404 handler"""
+    if isinstance(environment.runner, MasterRunner) or not environment.host:
+        return
+
+    session = requests.Session()
+    email = f"seed_{''.join(random.choices(string.ascii_lowercase, k=12))}@example.com"
+    password = "SeedPassword123"
+    session.post(f"{environment.host}/auth/signup", json={"email": email, "password": password})
+    login_response = session.post(f"{environment.host}/auth/token", data={
+        "username": email,
+        "password": password
+    })
+    if login_response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    def create_link(i):
+        return session.post(f"{environment.host}/links/",
+            json={"target_url": f"https://example.com/seed_{i}"},
+            headers=headers
+        )
+
+    for response in Pool(50).imap_unordered(create_link, range(SEED_LINK_COUNT)):
+        if response.status_code == 201:
+            seed_link_keys.append(response.json()["short_key"])
+
+
 class LinklyUser(HttpUser):
     """Simulate user behavior for performance testing"""
     
     wait_time = between(1, 3)  # Wait 1-3 seconds between requests
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set up front so tasks test plain attributes; headers stays None until login succeeds
+        self.headers = None
+        self.created_links = []
+    
     def on_start(self):
         """Setup user session"""
         self.signup_and_login()
     
     def signup_and_login(self):
         """Create user account and login"""
-        # Generate unique email
-        username = ''.join(random.choices(string.ascii_lowercase, k=8))
-        self.email = f"test_{username}@example.com"
+        # Unique email from the preallocated pool
+        self.email = f"test_{next_user_name()}@example.com"
         self.password = "TestPassword123"
         
         # Signup
@@ -39,12 +104,11 @@ class LinklyUser(HttpUser):
             if login_response.status_code == 200:
                 self.token = login_response.json()["access_token"]
                 self.headers = {"Authorization": f"Bearer {self.token}"}
-                self.created_links = []
     
     @task(3)
     def create_link(self):
         """Create a new short link"""
-        if hasattr(self, 'headers'):
+        if self.headers is not None:
             target_url = f"https://example.com/{random.randint(1000, 9999)}"
             
             response = self.client.post("/links/", 
@@ -59,27 +123,27 @@ class LinklyUser(HttpUser):
     @task(5)
     def use_link(self):
         """Use a created link (redirect)"""
-        if hasattr(self, 'created_links') and self.created_links:
+        if self.created_links:
             short_key = random.choice(self.created_links)
             self.client.get(f"/{short_key}", allow_redirects=False)
     
     @task(2)
     def view_my_links(self):
         """View user's links"""
-        if hasattr(self, 'headers'):
+        if self.headers is not None:
             self.client.get("/links/me", headers=self.headers)
     
     @task(1)
     def view_link_stats(self):
         """View link statistics"""
-        if hasattr(self, 'created_links') and self.created_links:
+        if self.created_links:
             short_key = random.choice(self.created_links)
             self.client.get(f"/links/{short_key}/stats")
     
     @task(1)
     def view_user_profile(self):
         """View user profile"""
-        if hasattr(self, 'headers'):
+        if self.headers is not None:
             self.client.get("/auth/me", headers=self.headers)
 
 
@@ -90,24 +154,23 @@ class AnonymousUser(HttpUser):
     
     def on_start(self):
         """Setup anonymous session"""
-        # Get some existing links to test (created by other users)
-        self.test_links = [
-            "testlink1", "testlink2", "testlink3"  # These would be real links in practice
-        ]
+        # Real links seeded at test start; random keys only if seeding failed
+        self.test_links = seed_link_keys
+
+    def pick_short_key(self):
+        if self.test_links:
+            return random.choice(self.test_links)
+        return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
     
     @task(10)
     def use_random_link(self):
         """Use random short links"""
-        # In practice, these would be real short keys
-        # For testing, we'll simulate with known patterns
-        short_key = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        self.client.get(f"/{short_key}", allow_redirects=False)
+        self.client.get(f"/{self.pick_short_key()}", allow_redirects=False)
     
     @task(2)
     def view_link_stats(self):
         """View link statistics as anonymous user"""
-        short_key = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        self.client.get(f"/links/{short_key}/stats")
+        self.client.get(f"/links/{self.pick_short_key()}/stats")
 
 
 class HighVolumeUser(HttpUser):
@@ -115,6 +178,12 @@ class HighVolumeUser(HttpUser):
     
     wait_time = between(0.1, 0.5)  # Very frequent requests
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set up front so tasks test plain attributes; headers stays None until login succeeds
+        self.headers = None
+        self.created_links = []
+    
     def on_start(self):
         """Setup high-volume user"""
         self.signup_and_login()
@@ -122,8 +191,7 @@ class HighVolumeUser(HttpUser):
     
     def signup_and_login(self):
         """Create account and login"""
-        username = ''.join(random.choices(string.ascii_lowercase, k=12))
-        self.email = f"hvuser_{username}@example.com"
+        self.email = f"hvuser_{next_user_name()}@example.com"
         self.password = "HighVolumePassword123"
         
         # Signup
@@ -141,31 +209,36 @@ class HighVolumeUser(HttpUser):
         if login_response.status_code == 200:
             self.token = login_response.json()["access_token"]
             self.headers = {"Authorization": f"Bearer {self.token}"}
-            self.created_links = []
     
     def create_initial_links(self):
         """Create initial set of links for testing"""
-        if hasattr(self, 'headers'):
-            for i in range(10):
-                target_url = f"https://example.com/hv_{i}_{random.randint(1000, 9999)}"
-                response = self.client.post("/links/",
-                    json={"target_url": target_url},
+        if self.headers is not None:
+            # Issue the creates concurrently so ramp-up costs about one round trip, not ten
+            group = Group()
+            pending = [
+                group.spawn(self.client.post, "/links/",
+                    json={"target_url": f"https://example.com/hv_{i}_{random.randint(1000, 9999)}"},
                     headers=self.headers
                 )
-                if response.status_code == 201:
+                for i in range(10)
+            ]
+            group.join()
+            for greenlet in pending:
+                response = greenlet.value
+                if response is not None and response.status_code == 201:
                     self.created_links.append(response.json()["short_key"])
     
     @task(20)
     def rapid_link_usage(self):
         """Rapidly use existing links"""
-        if hasattr(self, 'created_links') and self.created_links:
+        if self.created_links:
             short_key = random.choice(self.created_links)
             self.client.get(f"/{short_key}", allow_redirects=False)
     
     @task(5)
     def batch_create_links(self):
         """Create multiple links in quick succession"""
-        if hasattr(self, 'headers'):
+        if self.headers is not None:
             for _ in range(3):
                 target_url = f"https://example.com/batch_{random.randint(10000, 99999)}"
                 self.client.post("/links/",
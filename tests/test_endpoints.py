@@ -1,26 +1,47 @@
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
+from sqlalchemy import text
 
-client = TestClient(app)
+from app.services.redis_cache import link_cache, user_cache
 
-def signup_user():
+
+@pytest.fixture(scope="module")
+def client(_test_client, engine):
+    """The session's TestClient, entered once; unlike conftest's client it uses the app's own database"""
+    yield _test_client
+
+    # Nothing rolls back what this module committed; later modules expect empty tables and caches
+    with engine.begin() as conn:
+        user_rows = conn.execute(text("SELECT id, email FROM users")).all()
+        short_keys = conn.execute(text("SELECT short_key FROM links")).scalars().all()
+        conn.execute(text("TRUNCATE links, users"))
+    for user_id, email in user_rows:
+        user_cache.delete_user(email)
+        _test_client.portal.call(link_cache.invalidate_user_links, user_id)
+    for short_key in short_keys:
+        _test_client.portal.call(link_cache.delete_link, short_key)
+
+def signup_user(client):
     # Always try to sign up, ignore if already exists
     client.post("/auth/signup", json={"email": "testuser@example.com", "password": "testpass123"})
 
-def get_token():
-    signup_user()
+def get_token(client):
+    signup_user(client)
     response = client.post("/auth/token", data={"username": "testuser@example.com", "password": "testpass123"})
     assert response.status_code == 200
     return response.json()["access_token"]
 
-def test_signup():
+@pytest.fixture(scope="module")
+def auth_headers(client):
+    """Sign up and log in once; every test in this module reuses the Bearer header"""
+    return {"Authorization": f"Bearer {get_token(client)}"}
+
+def test_signup(client):
     response = client.post("/auth/signup", json={"email": "testuser@example.com", "password": "testpass123"})
     assert response.status_code in (200, 400)
 
 
-def test_login():
-    signup_user()
+def test_login(client):
+    signup_user(client)
     response = client.post("/auth/token", data={"username": "testuser@example.com", "password": "testpass123"})
     assert response.status_code == 200
     data = response.json()
@@ -28,19 +49,15 @@ def test_login():
     assert data["token_type"] == "bearer"
 
 
-def test_get_me():
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    response = client.get("/auth/me", headers=headers)
+def test_get_me(client, auth_headers):
+    response = client.get("/auth/me", headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
     assert data["email"] == "testuser@example.com"
 
 
-def test_create_link():
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    response = client.post("/links/", json={"target_url": "https://example.com"}, headers=headers)
+def test_create_link(client, auth_headers):
+    response = client.post("/links/", json={"target_url": "https://example.com"}, headers=auth_headers)
     assert response.status_code == 201
     data = response.json()
     assert "short_key" in data
@@ -48,80 +65,68 @@ def test_create_link():
     assert data["target_url"].rstrip("/") == "https://example.com"
 
 
-def test_my_links():
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    response = client.get("/links/me", headers=headers)
+def test_my_links(client, auth_headers):
+    response = client.get("/links/me", headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
 
 
-def test_link_stats():
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
+def test_link_stats(client, auth_headers):
     # Create a link first
-    response = client.post("/links/", json={"target_url": "https://example.com"}, headers=headers)
+    response = client.post("/links/", json={"target_url": "https://example.com"}, headers=auth_headers)
     assert response.status_code == 201
     short_key = response.json()["short_key"]
     # Now get stats
-    response = client.get(f"/links/{short_key}/stats", headers=headers)
+    response = client.get(f"/links/{short_key}/stats", headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
     assert data["short_key"] == short_key
     assert "clicks" in data
 
 
-def test_redirect_short_link():
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
+def test_redirect_short_link(client, auth_headers):
     # Create a link first
-    create_response = client.post("/links/", json={"target_url": "https://example.com/redirect_test"}, headers=headers)
+    create_response = client.post("/links/", json={"target_url": "https://example.com/redirect_test"}, headers=auth_headers)
     assert create_response.status_code == 201
     short_key = create_response.json()["short_key"]
 
     # Now test the redirection
-    redirect_response = client.get(f"/{short_key}", follow_redirects=False)
+    redirect_response = client.get(f"/{short_key}")
     assert redirect_response.status_code == 307  # Or 308 depending on FastAPI version/config
     assert "location" in redirect_response.headers
     assert redirect_response.headers["location"] == "https://example.com/redirect_test"
     
 
-def test_redirect_uses_cache():
+def test_redirect_uses_cache(client, auth_headers):
     """Test that second redirect uses cache"""
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    
     # Create a link
-    create_response = client.post("/links/", json={"target_url": "https://example.com/cache_test"}, headers=headers)
+    create_response = client.post("/links/", json={"target_url": "https://example.com/cache_test"}, headers=auth_headers)
     assert create_response.status_code == 201
     short_key = create_response.json()["short_key"]
     
     # First redirect (cache miss)
-    redirect_response = client.get(f"/{short_key}", follow_redirects=False)
+    redirect_response = client.get(f"/{short_key}")
     assert redirect_response.status_code == 307
     
     # Second redirect (should be cache hit)
-    redirect_response2 = client.get(f"/{short_key}", follow_redirects=False)
+    redirect_response2 = client.get(f"/{short_key}")
     assert redirect_response2.status_code == 307
     assert redirect_response2.headers["location"] == "https://example.com/cache_test"
 
-def test_link_stats_with_clicks():
+def test_link_stats_with_clicks(client, auth_headers):
     """Test that stats show correct click count"""
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    
     # Create a link
-    response = client.post("/links/", json={"target_url": "https://example.com/click_test"}, headers=headers)
+    response = client.post("/links/", json={"target_url": "https://example.com/click_test"}, headers=auth_headers)
     assert response.status_code == 201
     short_key = response.json()["short_key"]
     
     # Click the link 3 times
     for _ in range(3):
-        client.get(f"/{short_key}", follow_redirects=False)
+        client.get(f"/{short_key}")
     
     # Check stats
-    response = client.get(f"/links/{short_key}/stats", headers=headers)
+    response = client.get(f"/links/{short_key}/stats", headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
     assert data["clicks"] == 3
\ No newline at end of file
@@ -4,7 +4,7 @@ Unit tests for authentication module
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta, UTC
-from jose import jwt
+import jwt
 from fastapi import HTTPException
 
 from app import auth, models
@@ -20,7 +20,7 @@ class TestPasswordOperations:
         hashed = auth.get_password_hash(password)
         
         assert hashed != password
-        assert hashed.startswith("$2b$")
+        assert hashed.startswith("$argon2id$")
         assert len(hashed) > 50
 
     def test_verify_password_correct(self):
@@ -50,26 +50,35 @@ class TestPasswordOperations:
 class TestJWTTokens:
     """Test JWT token creation and validation"""
 
-    def test_create_access_token(self):
+    @pytest.fixture(scope="class")
+    def sample_token(self):
+        """One default-expiry token shared by the tests that only inspect its claims"""
+        return auth.create_access_token({"sub": "test@example.com", "user_id": 123})
+
+    @pytest.fixture(scope="class")
+    def decode(self):
+        """Decoder with the key bytes and algorithm list prepared once for the class"""
+        key = settings.secret_key.encode()
+        algorithms = [settings.algorithm]
+        return lambda token: jwt.decode(token, key, algorithms=algorithms)
+
+    def test_create_access_token(self, sample_token, decode):
         """Test access token creation"""
-        data = {"sub": "test@example.com"}
-        token = auth.create_access_token(data)
-        
-        assert isinstance(token, str)
-        assert len(token) > 100
+        assert isinstance(sample_token, str)
+        assert len(sample_token) > 100
         
         # Decode and verify
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode(sample_token)
         assert payload["sub"] == "test@example.com"
         assert "exp" in payload
 
-    def test_create_access_token_with_expiry(self):
+    def test_create_access_token_with_expiry(self, decode):
         """Test access token with custom expiry"""
         data = {"sub": "test@example.com"}
         expires_delta = timedelta(minutes=15)
         token = auth.create_access_token(data, expires_delta)
         
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode(token)
         
         # Check expiry is approximately 15 minutes from now
         exp_time = datetime.fromtimestamp(payload["exp"], tz=UTC)
@@ -78,31 +87,28 @@ class TestJWTTokens:
         
         assert time_diff < 5  # Within 5 seconds tolerance
 
-    def test_decode_valid_token(self):
+    def test_decode_valid_token(self, sample_token, decode):
         """Test decoding valid token"""
-        data = {"sub": "test@example.com", "user_id": 123}
-        token = auth.create_access_token(data)
-        
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode(sample_token)
         
         assert payload["sub"] == "test@example.com"
         assert payload["user_id"] == 123
 
-    def test_decode_invalid_token(self):
+    def test_decode_invalid_token(self, decode):
         """Test decoding invalid token"""
         invalid_token = "invalid.token.here"
         
-        with pytest.raises(jwt.JWTError):
-            jwt.decode(invalid_token, settings.secret_key, algorithms=[settings.algorithm])
+        with pytest.raises(jwt.InvalidTokenError):
+            decode(invalid_token)
 
-    def test_decode_expired_token(self):
+    def test_decode_expired_token(self, decode):
         """Test decoding expired token"""
         data = {"sub": "test@example.com"}
         expires_delta = timedelta(seconds=-1)  # Already expired
         token = auth.create_access_token(data, expires_delta)
         
         with pytest.raises(jwt.ExpiredSignatureError):
-            jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+            decode(token)
 
 
 class TestUserOperations:
@@ -120,12 +126,31 @@ class TestUserOperations:
         assert found_user.email == "test@example.com"
         assert found_user.id == user.id
 
+    def test_get_user_by_email_uses_cache(self, db_session, test_data_manager, fake_redis):
+        """Test that a repeated lookup is served from the user cache"""
+        user = test_data_manager.create_test_user(db_session, "cached-user@example.com")
+        auth.get_user_by_email(db_session, "cached-user@example.com")
+
+        with patch.object(db_session, "query") as mock_query:
+            found_user = auth.get_user_by_email(db_session, "cached-user@example.com")
+
+        mock_query.assert_not_called()
+        assert found_user.id == user.id
+        assert found_user.hashed_password == user.hashed_password
+
     def test_get_user_by_email_not_exists(self, db_session):
         """Test getting user that doesn't exist"""
         found_user = auth.get_user_by_email(db_session, "nonexistent@example.com")
         
         assert found_user is None
 
+    def test_email_registered(self, db_session, test_data_manager):
+        """Test the existence probe used by signup"""
+        test_data_manager.create_test_user(db_session, "taken@example.com")
+
+        assert auth.email_registered(db_session, "taken@example.com") is True
+        assert auth.email_registered(db_session, "free@example.com") is False
+
     def test_authenticate_user_valid_credentials(self, db_session, test_data_manager):
         """Test user authentication with valid credentials"""
         # Create test user
@@ -148,6 +173,14 @@ class TestUserOperations:
         
         assert result is False
 
+    def test_authenticate_user_invalid_email_still_verifies(self, db_session):
+        """Test that unknown emails still pay for a password verification"""
+        with patch("app.auth.verify_password", wraps=auth.verify_password) as mock_verify:
+            result = auth.authenticate_user(db_session, "nonexistent@example.com", "password")
+
+        assert result is False
+        mock_verify.assert_called_once_with("password", auth.get_dummy_hash())
+
     def test_authenticate_user_invalid_password(self, db_session, test_data_manager):
         """Test user authentication with invalid password"""
         # Create test user
@@ -159,6 +192,20 @@ class TestUserOperations:
         
         assert result is False
 
+    def test_authenticate_user_upgrades_bcrypt_hash(self, db_session):
+        """Test that a legacy bcrypt hash is rehashed with argon2 on login"""
+        password = "testpassword123"
+        legacy_hash = auth.get_pwd_context().hash(password, scheme="bcrypt")
+        user = models.User(email="legacy@example.com", hashed_password=legacy_hash)
+        db_session.add(user)
+        db_session.commit()
+
+        authenticated_user = auth.authenticate_user(db_session, "legacy@example.com", password)
+
+        assert authenticated_user.id == user.id
+        assert authenticated_user.hashed_password.startswith("$argon2id$")
+        assert auth.verify_password(password, authenticated_user.hashed_password) is True
+
 # Note: The following tests are commented out because the functionality
 # doesn't exist in the current auth module implementation
 # 
@@ -225,3 +272,47 @@ class TestGetCurrentUser:
             auth.get_current_user(token, db_session)
         
         assert exc_info.value.status_code == 401
+
+    def test_get_current_user_rejects_non_access_token(self, db_session, test_data_manager):
+        """Test that tokens without an access type claim are rejected"""
+        user = test_data_manager.create_test_user(db_session, "test@example.com")
+        token = jwt.encode(
+            {"sub": user.email, "exp": datetime.now(UTC) + timedelta(minutes=5), "type": "refresh"},
+            settings.secret_key,
+            algorithm=settings.algorithm,
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            auth.get_current_user(token, db_session)
+
+        assert exc_info.value.status_code == 401
+
+    def test_get_current_user_cache_hit_skips_decode(self, db_session, test_data_manager):
+        """Test that a verified token is served from the token cache"""
+        user = test_data_manager.create_test_user(db_session, "cached@example.com")
+        token = auth.create_access_token({"sub": user.email})
+
+        assert auth.get_current_user(token, db_session).id == user.id
+
+        with patch.object(auth._JWT, "decode") as mock_decode:
+            current_user = auth.get_current_user(token, db_session)
+
+        mock_decode.assert_not_called()
+        assert current_user.id == user.id
+
+    def test_get_current_user_cache_hit_rejects_deleted_user(self, db_session, test_data_manager):
+        """Test that a cached token stops authenticating once its user is deleted"""
+        user = test_data_manager.create_test_user(db_session, "deleted@example.com")
+        token = auth.create_access_token({"sub": user.email})
+
+        assert auth.get_current_user(token, db_session).id == user.id
+
+        db_session.delete(user)
+        db_session.commit()
+        # Deleting a user drops its cached row too; only the token cache is under test here
+        auth.user_cache.delete_user("deleted@example.com")
+
+        with pytest.raises(HTTPException) as exc_info:
+            auth.get_current_user(token, db_session)
+
+        assert exc_info.value.status_code == 401
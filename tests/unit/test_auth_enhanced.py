@@ -0,0 +1,135 @@
+"""
+Unit tests for the enhanced authentication module
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+import redis
+from unittest.mock import Mock
+
+from app import auth_enhanced
+
+
+class FakeClock:
+    """Stand-in for the time module; every reading moves forward 1 ms like a real clock would"""
+
+    def __init__(self):
+        self.now_ns = 1_700_000_000 * 10**9
+        self._lock = threading.Lock()
+
+    def time_ns(self) -> int:
+        with self._lock:
+            self.now_ns += 1_000_000
+            return self.now_ns
+
+    def time(self) -> float:
+        return self.now_ns / 1e9
+
+    def advance(self, seconds: float) -> None:
+        self.now_ns += int(seconds * 1e9)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Control the time check_rate_limit sees"""
+    fake_clock = FakeClock()
+    monkeypatch.setattr(auth_enhanced, "time", SimpleNamespace(time_ns=fake_clock.time_ns, time=fake_clock.time))
+    return fake_clock
+
+
+@pytest.fixture
+def rate_limit_redis(fake_redis, monkeypatch):
+    """Rate limiter backed by the fake Redis server"""
+    monkeypatch.setattr(auth_enhanced, "rate_limit_redis", fake_redis)
+    return fake_redis
+
+
+@pytest.mark.redis
+@pytest.mark.security
+class TestCheckRateLimit:
+    """Test the Redis sliding-window login rate limiter"""
+
+    def test_under_limit_allowed(self, rate_limit_redis, clock):
+        """Test that attempts up to the limit are allowed"""
+        results = [auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5) for _ in range(5)]
+
+        assert results == [True] * 5
+        assert rate_limit_redis.zcard("rl:login:1.2.3.4:a@example.com") == 5
+
+    def test_over_limit_blocked(self, rate_limit_redis, clock):
+        """Test that the attempt after the limit is rejected"""
+        for _ in range(5):
+            auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5)
+
+        assert auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5) is False
+
+    def test_limit_is_per_identifier(self, rate_limit_redis, clock):
+        """Test that one identifier hitting the limit does not block another"""
+        for _ in range(6):
+            auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5)
+
+        assert auth_enhanced.check_rate_limit("login:1.2.3.4:b@example.com", max_attempts=5) is True
+
+    def test_window_expiry_allows_again(self, rate_limit_redis, clock):
+        """Test that attempts older than the window no longer count"""
+        for _ in range(6):
+            auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5, window_minutes=15)
+
+        clock.advance(15 * 60)
+
+        assert auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5, window_minutes=15) is True
+        assert rate_limit_redis.zcard("rl:login:1.2.3.4:a@example.com") == 1
+
+    def test_attempts_inside_window_still_count(self, rate_limit_redis, clock):
+        """Test that only attempts older than the window are pruned"""
+        for _ in range(5):
+            auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5, window_minutes=15)
+
+        # The oldest earlier attempt is now 1 ms inside the window
+        clock.advance(15 * 60 - 0.006)
+
+        assert auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5, window_minutes=15) is False
+
+    def test_concurrent_attempts_admit_exactly_the_limit(self, rate_limit_redis, clock):
+        """Test that parallel request threads cannot get more than the allowed attempts"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda _: auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=5),
+                range(40),
+            ))
+
+        assert results.count(True) == 5
+
+    def test_key_expires_with_window(self, rate_limit_redis, clock):
+        """Test that an idle identifier's key is removed by Redis instead of kept forever"""
+        auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", window_minutes=15)
+
+        assert 0 < rate_limit_redis.ttl("rl:login:1.2.3.4:a@example.com") <= 15 * 60
+
+    def test_fails_open_when_redis_unavailable(self, monkeypatch):
+        """Test that a Redis outage does not lock every user out"""
+        broken_redis = Mock()
+        broken_redis.pipeline.return_value.execute.side_effect = redis.ConnectionError("Connection refused")
+        monkeypatch.setattr(auth_enhanced, "rate_limit_redis", broken_redis)
+
+        assert auth_enhanced.check_rate_limit("login:1.2.3.4:a@example.com", max_attempts=0) is True
+
+
+class TestPasswordStrength:
+    """Test the password strength rule"""
+
+    @pytest.mark.parametrize("password,expected", [
+        ("Abc1234", False),         # too short
+        ("abcdefg1", False),        # no uppercase letter
+        ("ABCDEFG1", False),        # no lowercase letter
+        ("Abcdefgh", False),        # no digit
+        ("Abcdefg1", True),
+        ("Abcd\nefg1", True),       # "." must also match newlines, hence re.DOTALL
+        ("1bcdefgh\nA", True),      # required characters on either side of a newline
+    ])
+    def test_validate_password_strength(self, password, expected):
+        """Test each requirement on its own and a password meeting all of them"""
+        assert auth_enhanced.validate_password_strength(password) is expected
+        assert (auth_enhanced.PASSWORD_STRENGTH_RE.match(password) is not None) is expected
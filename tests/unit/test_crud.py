@@ -1,9 +1,11 @@
 """
 Unit tests for CRUD operations
 """
+import re
 import pytest
 from unittest.mock import Mock, patch
 import secrets
+from datetime import timedelta
 
 from app import crud, models, schemas
 
@@ -11,12 +13,6 @@ from app import crud, models, schemas
 class TestLinkCreation:
     """Test link creation functionality"""
 
-    def setup_method(self):
-        """Setup method to clean up any mocks before each test"""
-        # Reset any patches that might be lingering
-        from unittest.mock import patch
-        patch.stopall()
-
     def test_create_link_success(self, db_session, test_data_manager):
         """Test successful link creation"""
         user = test_data_manager.create_test_user(db_session)
@@ -40,48 +36,50 @@ class TestLinkCreation:
         
         assert link1.short_key != link2.short_key
 
-    def test_create_link_collision_retry(self, db_session, test_data_manager):
-        """Test short key collision handling"""
-        # Ensure no mocks are interfering
-        from unittest.mock import patch
-        
-        # Clear any existing mocks by creating a fresh patch that we immediately stop
-        with patch('app.crud.secrets.token_urlsafe') as mock_token:
-            mock_token.stop()
-        
+    def test_create_link_skips_taken_candidates(self, db_session, test_data_manager):
+        """Test that a candidate key already in use is skipped"""
+        user = test_data_manager.create_test_user(db_session)
+        existing_link = test_data_manager.create_test_link(db_session, user)
+        link_data = schemas.LinkCreate(target_url="https://example.com")
+
+        with patch('app.crud.secrets.token_urlsafe', side_effect=[existing_link.short_key, "freshkey"]):
+            with patch.object(crud, 'NUM_KEY_GENERATION_ATTEMPTS', 2):
+                new_link = crud.create_link(db_session, link_data, user.id)
+
+        assert new_link.short_key == "freshkey"
+
+    def test_create_link_uses_preallocated_key(self, db_session, test_data_manager):
+        """Test that a key from the Redis sequence is used as-is"""
+        user = test_data_manager.create_test_user(db_session)
+        link_data = schemas.LinkCreate(target_url="https://example.com")
+
+        new_link = crud.create_link(db_session, link_data, user.id, short_key="seqkey1")
+
+        assert new_link.short_key == "seqkey1"
+
+    def test_create_link_preallocated_key_taken(self, db_session, test_data_manager):
+        """Test that a taken preallocated key falls back to a random key"""
         user = test_data_manager.create_test_user(db_session)
-        
-        # Create existing link with known short key
         existing_link = test_data_manager.create_test_link(db_session, user)
-        existing_short_key = existing_link.short_key
-        
-        # Instead of mocking, let's test the collision scenario differently
-        # by creating links until we get different short keys (which proves uniqueness)
         link_data = schemas.LinkCreate(target_url="https://example.com")
-        
-        # Create multiple links to test uniqueness
-        created_links = []
-        for i in range(5):
-            new_link = crud.create_link(db_session, link_data, user.id)
-            created_links.append(new_link)
-        
-        # Verify all short keys are unique
-        short_keys = [link.short_key for link in created_links]
-        assert len(set(short_keys)) == len(short_keys), "All short keys should be unique"
-        
-        # Verify none of them match the existing link
-        for link in created_links:
-            assert link.short_key != existing_short_key
+
+        with patch('app.crud.secrets.token_urlsafe', return_value="randomkey"):
+            new_link = crud.create_link(db_session, link_data, user.id, short_key=existing_link.short_key)
+
+        assert new_link.short_key == "randomkey"
+
+    def test_create_link_all_candidates_taken(self, db_session, test_data_manager):
+        """Test that creation fails when every candidate key is taken"""
+        user = test_data_manager.create_test_user(db_session)
+        existing_link = test_data_manager.create_test_link(db_session, user)
+        link_data = schemas.LinkCreate(target_url="https://example.com")
+
+        with patch('app.crud.secrets.token_urlsafe', return_value=existing_link.short_key):
+            with pytest.raises(Exception, match="unique short key"):
+                crud.create_link(db_session, link_data, user.id)
 
     def test_create_link_max_retries_exceeded(self, db_session, test_data_manager):
         """Test when max retries for unique key generation is exceeded"""
-        # Ensure no mocks are interfering
-        from unittest.mock import patch
-        
-        # Clear any existing mocks by creating a fresh patch that we immediately stop
-        with patch('app.crud.secrets.token_urlsafe') as mock_token:
-            mock_token.stop()
-        
         # This test is difficult to implement without mocking due to the extremely low
         # probability of collision with secrets.token_urlsafe. 
         # Instead, let's test that the retry mechanism exists by verifying the constant
@@ -100,21 +98,18 @@ class TestLinkCreation:
         assert new_link is not None
         assert new_link.short_key is not None
 
-    def test_create_link_url_normalization(self, db_session, test_data_manager):
-        """Test URL normalization during link creation"""
+    @pytest.mark.parametrize("input_url,expected_url", [
+        ("https://example.com", "https://example.com/"),  # Pydantic adds trailing slash
+        ("http://example.com", "http://example.com/"),    # Pydantic adds trailing slash
+        ("https://example.com/", "https://example.com/"),
+    ])
+    def test_create_link_url_normalization(self, db_session, test_data_manager, input_url, expected_url):
+        """Test URL normalization during link creation - Pydantic HttpUrl normalizes URLs"""
         user = test_data_manager.create_test_user(db_session)
         
-        # Test with various URL formats - Pydantic HttpUrl normalizes URLs
-        test_cases = [
-            ("https://example.com", "https://example.com/"),  # Pydantic adds trailing slash
-            ("http://example.com", "http://example.com/"),    # Pydantic adds trailing slash
-            ("https://example.com/", "https://example.com/"),
-        ]
-        
-        for input_url, expected_url in test_cases:
-            link_data = schemas.LinkCreate(target_url=input_url)
-            created_link = crud.create_link(db_session, link_data, user.id)
-            assert created_link.target_url == expected_url
+        link_data = schemas.LinkCreate(target_url=input_url)
+        created_link = crud.create_link(db_session, link_data, user.id)
+        assert created_link.target_url == expected_url
 
 
 class TestUserLinks:
@@ -133,9 +128,9 @@ class TestUserLinks:
         user = test_data_manager.create_test_user(db_session)
         
         # Create multiple links
-        link1 = test_data_manager.create_test_link(db_session, user, "https://example1.com")
-        link2 = test_data_manager.create_test_link(db_session, user, "https://example2.com")
-        link3 = test_data_manager.create_test_link(db_session, user, "https://example3.com")
+        link1, link2, link3 = test_data_manager.create_test_links(
+            db_session, user, ["https://example1.com", "https://example2.com", "https://example3.com"]
+        )
         
         links = crud.get_user_links(db_session, user.id)
         
@@ -145,6 +140,19 @@ class TestUserLinks:
         assert link2.id in link_ids
         assert link3.id in link_ids
 
+    def test_get_user_links_newest_first(self, db_session, test_data_manager):
+        """Test that user links are ordered by creation time, newest first"""
+        user = test_data_manager.create_test_user(db_session)
+        older = test_data_manager.create_test_link(db_session, user, "https://example1.com")
+        newer = test_data_manager.create_test_link(db_session, user, "https://example2.com")
+        # now() is fixed for the whole test transaction, so spread the timestamps explicitly
+        older.created_at = newer.created_at - timedelta(minutes=1)
+        db_session.commit()
+
+        links = crud.get_user_links(db_session, user.id)
+
+        assert [link.id for link in links] == [newer.id, older.id]
+
     def test_get_user_links_isolation(self, db_session, test_data_manager):
         """Test that users only see their own links"""
         user1 = test_data_manager.create_test_user(db_session, "user1@example.com")
@@ -168,6 +176,18 @@ class TestUserLinks:
 class TestLinkStats:
     """Test link statistics functionality"""
 
+    def test_get_links_by_keys(self, db_session, test_data_manager):
+        """Test resolving several short keys in one query"""
+        user = test_data_manager.create_test_user(db_session)
+        link1 = test_data_manager.create_test_link(db_session, user, "https://example1.com")
+        link2 = test_data_manager.create_test_link(db_session, user, "https://example2.com")
+        test_data_manager.create_test_link(db_session, user, "https://example3.com")
+
+        links = crud.get_links_by_keys(db_session, [link1.short_key, link2.short_key, "nonexistent"])
+
+        assert {link.id for link in links} == {link1.id, link2.id}
+        assert crud.get_links_by_keys(db_session, []) == []
+
     def test_get_link_stats_exists(self, db_session, test_data_manager):
         """Test getting stats for existing link"""
         user = test_data_manager.create_test_user(db_session)
@@ -177,7 +197,6 @@ class TestLinkStats:
         
         assert stats is not None
         assert stats.short_key == link.short_key
-        assert stats.target_url == link.target_url
         assert stats.clicks == 0
 
     def test_get_link_stats_not_exists(self, db_session):
@@ -239,49 +258,100 @@ class TestLinkRedirection:
         # Increment clicks
         crud.get_link_and_increment_clicks(db_session, link.short_key)
         
-        # Refresh from database
-        db_session.refresh(link)
+        # Reload just the clicks column from the database
+        db_session.expire(link, ['clicks'])
         assert link.clicks == 1
-        
-        # Get fresh copy from database
-        fresh_link = db_session.query(models.Link).filter_by(short_key=link.short_key).first()
-        assert fresh_link.clicks == 1
+
+    def test_increment_link_clicks_returns_target(self, db_session, test_data_manager):
+        """Test the Core click increment used by the redirect hot path"""
+        user = test_data_manager.create_test_user(db_session)
+        link = test_data_manager.create_test_link(db_session, user, "https://example.com/core")
+
+        row = crud.increment_link_clicks(db_session.connection(), link.short_key)
+        db_session.commit()
+
+        assert row.target_url == "https://example.com/core"
+        assert row.clicks == 1
+        db_session.expire(link, ['clicks'])
+        assert link.clicks == 1
+
+    def test_increment_link_clicks_not_exists(self, db_session):
+        """Test the Core click increment for a non-existent link"""
+        assert crud.increment_link_clicks(db_session.connection(), "nonexistent") is None
+
+    def test_flush_link_clicks_bulk_update(self, db_session, test_data_manager):
+        """Test that buffered counters are written for several links in one statement"""
+        user = test_data_manager.create_test_user(db_session)
+        first = test_data_manager.create_test_link(db_session, user, "https://example.com/a")
+        second = test_data_manager.create_test_link(db_session, user, "https://example.com/b")
+        second.clicks = 10
+        db_session.commit()
+
+        crud.flush_link_clicks(db_session.connection(), {first.short_key: 7, second.short_key: 3})
+        db_session.commit()
+
+        db_session.expire(first, ['clicks'])
+        db_session.expire(second, ['clicks'])
+        assert first.clicks == 7
+        assert second.clicks == 10  # never moves backwards
 
 
 class TestShortKeyGeneration:
     """Test short key generation logic"""
 
+    def test_base62_encode(self):
+        """Test base62 encoding of sequence numbers"""
+        assert crud.base62_encode(0) == "0"
+        assert crud.base62_encode(61) == "z"
+        assert crud.base62_encode(62) == "10"
+        assert len(crud.base62_encode(62 ** 5)) == 6
+
+    def test_base62_decode(self):
+        """Test that decoding reverses base62_encode"""
+        for number in (0, 61, 62, 62 ** 5, 62 ** 6 + 12345):
+            assert crud.base62_decode(crud.base62_encode(number)) == number
+
+    def test_get_last_link_number(self, db_session, test_data_manager):
+        """Test that the largest sequential key is found and random keys are ignored"""
+        user = test_data_manager.create_test_user(db_session)
+        # "a" sorts after "Z" and "9", and a longer key is always the larger number
+        for short_key in ("100000", "10000Z", "zzzzzz", "1000000", "10000a", "abcdefgh", "a-b_cd"):
+            db_session.add(models.Link(short_key=short_key, target_url="https://example.com", owner_id=user.id))
+        db_session.commit()
+
+        assert crud.get_last_link_number(db_session) == crud.base62_decode("1000000")
+
+    def test_get_last_link_number_none(self, db_session, test_data_manager):
+        """Test that only random keys means the sequence has nothing to skip"""
+        test_data_manager.create_test_link(db_session, test_data_manager.create_test_user(db_session))
+
+        assert crud.get_last_link_number(db_session) is None
+
     def test_short_key_length(self):
-        """Test that generated short keys have correct length"""
+        """Test that generated short keys have correct length and only URL-safe characters"""
         short_key = secrets.token_urlsafe(crud.SHORT_KEY_NUM_BYTES)
         
         # URL-safe base64 encoding can vary in length, but should be around expected
         assert len(short_key) >= 6
         assert len(short_key) <= 12
-
-    def test_short_key_characters(self):
-        """Test that short keys only contain URL-safe characters"""
-        import string
-        
-        short_key = secrets.token_urlsafe(crud.SHORT_KEY_NUM_BYTES)
-        
         # URL-safe characters: a-z, A-Z, 0-9, -, _
-        allowed_chars = string.ascii_letters + string.digits + '-_'
-        
-        for char in short_key:
-            assert char in allowed_chars
+        assert re.fullmatch(r"[A-Za-z0-9_-]+", short_key)
 
     def test_short_key_uniqueness(self):
         """Test that generated short keys are unique"""
-        keys = set()
+        # The same call create_link uses for its random candidates
+        draws = 100_000
+        keys = {secrets.token_urlsafe(crud.SHORT_KEY_NUM_BYTES) for _ in range(draws)}
         
-        # Generate many keys and check for duplicates
-        for _ in range(1000):
-            key = secrets.token_urlsafe(crud.SHORT_KEY_NUM_BYTES)
-            keys.add(key)
-        
-        # Should have close to 1000 unique keys (allowing for very rare collisions)
-        assert len(keys) > 990
+        # Should have close to 100k unique keys (allowing for very rare collisions)
+        assert len(keys) > 99_900
+
+        # Keys from the Redis sequence never repeat and are too short to clash with random keys
+        first = 62 ** 5
+        sequence_keys = {crud.base62_encode(number) for number in range(first, first + draws)}
+        assert len(sequence_keys) == draws
+        assert {len(key) for key in sequence_keys} <= set(crud.SEQUENCE_KEY_LENGTHS)
+        assert sequence_keys.isdisjoint(keys)
 
 
 class TestDatabaseTransactions:
@@ -320,5 +390,5 @@ class TestDatabaseTransactions:
         assert result.clicks == initial_clicks + 1
         
         # Verify persistence
-        db_session.refresh(link)
+        db_session.expire(link, ['clicks'])
         assert link.clicks == initial_clicks + 1
@@ -0,0 +1,106 @@
+"""
+Unit tests for the Redis link cache
+"""
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+import redis
+from unittest.mock import Mock
+
+from app.services.redis_cache import LinkCache
+
+
+class FakePubSub:
+    """PubSub stand-in that fails on subscribe or delivers some messages and then stays idle"""
+
+    def __init__(self, messages=(), fail=False):
+        self.messages = list(messages)
+        self.fail = fail
+        self.listening = asyncio.Event()
+        self.closed = False
+
+    async def subscribe(self, channel):
+        if self.fail:
+            raise redis.ConnectionError("Connection refused")
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        self.listening.set()
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cache():
+    link_cache = LinkCache()
+    link_cache.invalidation_retry_min_seconds = 0
+    return link_cache
+
+
+@pytest.mark.redis
+class TestInvalidationListener:
+    """Test the pub/sub listener that keeps the in-process cache in sync"""
+
+    @pytest.mark.asyncio
+    async def test_resubscribes_after_redis_error(self, cache, monkeypatch):
+        """Test that a failed subscription is retried and the local cache is cleared on reconnect"""
+        broken, working = FakePubSub(fail=True), FakePubSub(messages=[{"data": "deleted"}])
+        client = Mock()
+        client.pubsub.side_effect = [broken, working]
+        monkeypatch.setattr(cache, "_client", lambda: client)
+        cache._local["missed"] = "https://example.com/missed"
+        cache._local["deleted"] = "https://example.com/deleted"
+
+        listener = asyncio.create_task(cache.listen_for_invalidations())
+        try:
+            await asyncio.wait_for(working.listening.wait(), timeout=5)
+
+            assert broken.closed
+            assert not listener.done()
+            # Deletes published while disconnected were missed, so nothing local survives
+            assert "missed" not in cache._local
+        finally:
+            listener.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener
+        assert working.closed
+
+
+@pytest.fixture
+def cache_redis(cache, monkeypatch):
+    """Point the cache at its own fake server; the shared fake async client is bound to the app's loop"""
+    server = fakeredis.FakeServer()
+    fake_async_redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(cache, "_client", lambda: fake_async_redis)
+    return fake_async_redis, fakeredis.FakeStrictRedis(server=server, decode_responses=True)
+
+
+@pytest.mark.redis
+class TestDirtyClicks:
+    """Test taking buffered click counters for the database flush"""
+
+    @pytest.mark.asyncio
+    async def test_pop_dirty_clicks(self, cache, cache_redis):
+        """Test that dirty links come back with their counters and leave the dirty set"""
+        _, fake_redis = cache_redis
+        fake_redis.set("clicks:abc123", 3)
+        fake_redis.sadd("dirty_clicks", "abc123")
+
+        assert await cache.pop_dirty_clicks() == {"abc123": 3}
+        assert fake_redis.smembers("dirty_clicks") == set()
+
+    @pytest.mark.asyncio
+    async def test_pop_dirty_clicks_requeues_on_read_failure(self, cache, cache_redis, monkeypatch):
+        """Test that links popped before a failed counter read are marked dirty again"""
+        fake_async_redis, fake_redis = cache_redis
+        monkeypatch.setattr(fake_async_redis, "mget", Mock(side_effect=redis.ConnectionError("Connection reset")))
+        fake_redis.set("clicks:abc123", 3)
+        fake_redis.sadd("dirty_clicks", "abc123", "def456")
+
+        assert await cache.pop_dirty_clicks() == {}
+        assert fake_redis.smembers("dirty_clicks") == {"abc123", "def456"}